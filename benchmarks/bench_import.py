@@ -0,0 +1,130 @@
+"""Import-time budget for the integration.
+
+Imports each target in a fresh interpreter that has already loaded what
+Home Assistant itself always has by the time it loads an integration
+(core, config entries, config validation, storage, the update coordinator
+and the sensor platform), so only the integration's own cost is counted:
+
+    package       ``custom_components.omnisense``, what HA imports to
+                  find out about the integration at all
+    config_flow   the config and options flows
+    sensor        the sensor platform, loaded when an entry is set up
+
+Each target is imported ``--runs`` times and the best time kept. Any
+target that loads one of the heavy modules, which only the code paths
+using them should pull in, fails the run. So does the sensor platform,
+which imports the package with it, taking longer than ``--max-time`` or
+loading more than ``--max-modules`` new modules::
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --max-time 0.05 --max-modules 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TARGETS = {
+    "package": "custom_components.omnisense",
+    "config_flow": "custom_components.omnisense.config_flow",
+    "sensor": "custom_components.omnisense.sensor",
+}
+
+BASELINE = (
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator",
+    "homeassistant.components.sensor",
+)
+
+# Top-level packages no target may load at import time.
+HEAVY_MODULES = ("numpy", "scipy", "bs4", "requests", "multiprocessing", "pyomnisense")
+
+_PROBE = """
+import importlib, json, sys, time
+for name in {baseline!r}:
+    importlib.import_module(name)
+before = set(sys.modules)
+started = time.perf_counter()
+importlib.import_module({target!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(set(sys.modules) - before)}}))
+"""
+
+
+@dataclass
+class TargetResult:
+    module: str
+    seconds: float
+    modules: int
+    heavy: list[str] = field(default_factory=list)
+
+
+def measure(target: str, runs: int) -> TargetResult:
+    best = None
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(baseline=BASELINE, target=target)],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        if best is None or probe["seconds"] < best["seconds"]:
+            best = probe
+    loaded = {module.split(".")[0] for module in best["modules"]}
+    return TargetResult(
+        module=target,
+        seconds=best["seconds"],
+        modules=len(best["modules"]),
+        heavy=sorted(loaded.intersection(HEAVY_MODULES)),
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="imports per target, best one kept")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--max-time", type=float, help="seconds allowed for the sensor platform import")
+    parser.add_argument("--max-modules", type=int, help="new modules allowed for the sensor platform import")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = {name: measure(target, args.runs) for name, target in TARGETS.items()}
+
+    if args.json:
+        print(json.dumps({name: asdict(result) for name, result in results.items()}, indent=2))
+    else:
+        print("Omnisense import time (on top of Home Assistant's own modules)")
+        for name, result in results.items():
+            print(f"  {name:<12} {result.seconds * 1000:7.1f} ms  {result.modules:4d} modules  "
+                  f"heavy: {', '.join(result.heavy) or 'none'}")
+
+    failures = [
+        f"{name} import loads {module}"
+        for name, result in results.items()
+        for module in result.heavy
+    ]
+    sensor = results["sensor"]
+    if args.max_time is not None and sensor.seconds > args.max_time:
+        failures.append(f"sensor import took {sensor.seconds:.3f}s, budget {args.max_time:.3f}s")
+    if args.max_modules is not None and sensor.modules > args.max_modules:
+        failures.append(f"sensor import loaded {sensor.modules} modules, budget {args.max_modules}")
+    for failure in failures:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
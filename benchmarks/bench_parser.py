@@ -0,0 +1,181 @@
+"""Parser backend parity check and throughput benchmark.
+
+First checks that every backend in ``custom_components.omnisense.parser``
+returns the same readings as BeautifulSoup, field for field, for:
+
+    fixtures      the saved pages in ``benchmarks/fixtures`` (portal
+                  layout, markup quirks, malformed tables, empty site)
+    generated     pages rendered by the fake portal at several points in
+                  simulated time
+
+then times each backend on a generated page and reports rows parsed per
+second. Any mismatch makes the process exit non-zero, as does a speedup
+below ``--min-speedup``::
+
+    python -m benchmarks.bench_parser
+    python -m benchmarks.bench_parser --sensors 500 --min-speedup 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from time import perf_counter
+
+from custom_components.omnisense.parser import (
+    PARSER_BEAUTIFULSOUP,
+    PARSERS,
+    parse_sensor_page,
+)
+from custom_components.omnisense.reading import SensorReading
+
+from .fake_portal import FakePortal, PortalConfig
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# Simulated seconds at which generated pages are rendered for the parity
+# check; spread out so readings and timestamps differ between them.
+GENERATED_CLOCKS = (0, 3_600, 86_400 * 3 + 17)
+
+
+@dataclass
+class BackendResult:
+    rows_per_s: float
+    page_ms: float
+    speedup: float
+
+
+@dataclass
+class ParserBenchResult:
+    pages_checked: int = 0
+    fallbacks: list[str] = field(default_factory=list)
+    mismatches: list[str] = field(default_factory=list)
+    rows: int = 0
+    page_kib: float = 0.0
+    backends: dict[str, BackendResult] = field(default_factory=dict)
+
+
+def _diff(name: str, expected: dict, actual: dict) -> list[str]:
+    problems = []
+    for sid in sorted(expected.keys() | actual.keys()):
+        if sid not in actual:
+            problems.append(f"{name}: sensor {sid} missing")
+        elif sid not in expected:
+            problems.append(f"{name}: unexpected sensor {sid}")
+        else:
+            for attr in SensorReading.FIELDS:
+                value = getattr(expected[sid], attr)
+                got = getattr(actual[sid], attr)
+                if got != value or type(got) is not type(value):
+                    problems.append(f"{name}: {sid}.{attr} = {got!r}, expected {value!r}")
+    return problems
+
+
+def check_parity(result: ParserBenchResult, pages: dict[str, bytes]):
+    reference = PARSERS[PARSER_BEAUTIFULSOUP]
+    for name, body in pages.items():
+        expected = reference(body)
+        for backend, parse in PARSERS.items():
+            if backend == PARSER_BEAUTIFULSOUP:
+                continue
+            try:
+                parse(body)
+            except ValueError:
+                result.fallbacks.append(f"{name} ({backend})")
+            result.mismatches.extend(
+                _diff(f"{name} [{backend}]", expected, parse_sensor_page(body, parser=backend))
+            )
+        result.pages_checked += 1
+
+
+def _portal_pages(sites: int, sensors: int) -> dict[str, bytes]:
+    portal = FakePortal(PortalConfig(sites=sites, sensors_per_site=sensors, seed=7))
+    pages = {}
+    for clock in GENERATED_CLOCKS:
+        portal._clock = clock  # pylint: disable=protected-access
+        for site_id in portal.sites:
+            pages[f"generated/{site_id}@{clock}"] = portal.render_site(site_id).encode()
+    return pages
+
+
+def _time(parse, body: bytes, min_time: float) -> float:
+    """Best per-call time over repeated batches lasting ``min_time`` in total."""
+    best = float("inf")
+    spent = 0.0
+    while spent < min_time:
+        started = perf_counter()
+        parse(body)
+        elapsed = perf_counter() - started
+        best = min(best, elapsed)
+        spent += elapsed
+    return best
+
+
+def run_benchmark(args) -> ParserBenchResult:
+    result = ParserBenchResult()
+    pages = {f"fixtures/{path.name}": path.read_bytes() for path in sorted(FIXTURES.glob("*.html"))}
+    pages.update(_portal_pages(sites=3, sensors=40))
+    check_parity(result, pages)
+
+    portal = FakePortal(PortalConfig(sites=1, sensors_per_site=args.sensors, seed=11))
+    body = portal.render_site(next(iter(portal.sites))).encode()
+    result.rows = len(PARSERS[PARSER_BEAUTIFULSOUP](body))
+    result.page_kib = len(body) / 1024
+
+    seconds = {backend: _time(parse, body, args.min_time) for backend, parse in PARSERS.items()}
+    for backend, per_page in seconds.items():
+        result.backends[backend] = BackendResult(
+            rows_per_s=result.rows / per_page,
+            page_ms=per_page * 1000,
+            speedup=seconds[PARSER_BEAUTIFULSOUP] / per_page,
+        )
+    return result
+
+
+def _print_report(result: ParserBenchResult):
+    print(f"Omnisense parser benchmark: {result.rows} rows, {result.page_kib:.0f} KiB page")
+    print(f"  parity         {result.pages_checked} pages, {len(result.mismatches)} mismatches, "
+          f"fell back on {', '.join(result.fallbacks) or 'none'}")
+    for mismatch in result.mismatches[:20]:
+        print(f"    {mismatch}")
+    for backend, timing in result.backends.items():
+        print(f"  {backend:<14} {timing.rows_per_s:9.0f} rows/s  {timing.page_ms:7.2f} ms/page  "
+              f"x{timing.speedup:.1f}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sensors", type=int, default=200, help="rows on the timed page")
+    parser.add_argument("--min-time", type=float, default=1.0,
+                        help="seconds spent timing each backend")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--min-speedup", type=float,
+                        help="fail unless every backend is at least this much faster than BeautifulSoup")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = run_benchmark(args)
+
+    if args.json:
+        print(json.dumps(asdict(result), indent=2))
+    else:
+        _print_report(result)
+
+    failures = [f"parity: {mismatch}" for mismatch in result.mismatches]
+    if args.min_speedup is not None:
+        failures.extend(
+            f"{backend} speedup x{timing.speedup:.1f} below x{args.min_speedup:.1f}"
+            for backend, timing in result.backends.items()
+            if backend != PARSER_BEAUTIFULSOUP and timing.speedup < args.min_speedup
+        )
+    for failure in failures:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""End-to-end refresh benchmark against the synthetic portal.
+
+Brings up a real Home Assistant core (no frontend, no recorder), points
+pyomnisense at :mod:`benchmarks.fake_portal` (served from a child process
+unless ``--in-process``), sets up the sensor platform
+through ``async_setup_entry`` and then drives repeated coordinator
+refreshes (of every per-site coordinator at once with ``--shard-sites``). Reports::
+
+    setup         time for async_setup_entry, including the first fetch
+    refresh       p50 / p95 / p99 / max latency of coordinator refreshes
+    state writes  entity state writes per refresh, in total and per entity
+    loop blocked  total and worst event-loop stall seen by a lag probe, and
+                  the p95 the coordinator's own stall watchdog reported
+    memory        peak RSS of the process, and the tracemalloc peak of a
+                  few extra refreshes (kept out of the timed ones, since
+                  tracing slows everything down)
+
+Runs offline, so it can gate CI: pass ``--max-*`` budgets and the process
+exits non-zero when one is exceeded::
+
+    python -m benchmarks.bench_refresh --sites 5 --sensors 50 --refreshes 30
+    python -m benchmarks.bench_refresh --json --max-refresh-p95 0.5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from time import perf_counter
+
+from homeassistant import config_entries, loader
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers import entity as entity_helper
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import EntityPlatform
+
+from custom_components.omnisense import sensor
+from custom_components.omnisense.account import async_release_account
+from custom_components.omnisense.const import (
+    CONF_FRESHNESS_WINDOW,
+    CONF_SELECTED_SENSORS,
+    CONF_SELECTED_SITES,
+    CONF_SHARD_SITES,
+    DOMAIN,
+)
+
+from .fake_portal import FakePortal, PortalConfig, PortalProcess, point_pyomnisense_at
+
+# The lag probe wakes up this often; anything it oversleeps by more than
+# LAG_TOLERANCE is counted as the loop being blocked.
+LAG_PROBE_INTERVAL = 0.005
+LAG_TOLERANCE = 0.002
+
+# Untimed refreshes run under tracemalloc after the timed ones.
+MEMORY_REFRESHES = 3
+
+
+@dataclass
+class BenchResult:
+    sites: int
+    sensors: int
+    entities: int = 0
+    setup_s: float = 0.0
+    refreshes: int = 0
+    refresh_p50_s: float = 0.0
+    refresh_p95_s: float = 0.0
+    refresh_p99_s: float = 0.0
+    refresh_max_s: float = 0.0
+    failed_refreshes: int = 0
+    state_writes_setup: int = 0
+    state_writes_per_refresh: float = 0.0
+    state_writes_per_entity: float = 0.0
+    suppressed_writes: int = 0
+    loop_blocked_s: float = 0.0
+    loop_max_stall_s: float = 0.0
+    peak_rss_mb: float = 0.0
+    refresh_alloc_peak_mb: float = 0.0
+    phases_p95_s: dict = field(default_factory=dict)
+    coordinator_loop_blocked_p95_s: float | None = None
+    portal: dict = field(default_factory=dict)
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoopLagProbe:
+    """Measures how long the event loop was unable to run a due callback."""
+
+    def __init__(self):
+        self.blocked = 0.0
+        self.max_stall = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lag = perf_counter() - started - LAG_PROBE_INTERVAL
+            if lag > LAG_TOLERANCE:
+                self.blocked += lag
+                self.max_stall = max(self.max_stall, lag)
+
+    def reset(self):
+        self.blocked = 0.0
+        self.max_stall = 0.0
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run_benchmark(args) -> BenchResult:
+    portal_class = FakePortal if args.in_process else PortalProcess
+    portal = portal_class(PortalConfig(
+        sites=args.sites,
+        sensors_per_site=args.sensors,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        session_ttl=args.session_ttl,
+        clock_step=args.clock_step,
+        etags=args.etags,
+    ))
+    base_url = await portal.start()
+    point_pyomnisense_at(base_url)
+
+    writes = 0
+    write_state = Entity.async_write_ha_state
+
+    def counting_write_state(self):
+        nonlocal writes
+        writes += 1
+        write_state(self)
+
+    Entity.async_write_ha_state = counting_write_state
+
+    result = BenchResult(sites=args.sites, sensors=args.sensors)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        # Entity state writes that take too long look up the integration
+        # to suggest where to report it; that needs the loader's data.
+        loader.async_setup(hass)
+        await dr.async_load(hass)
+        await er.async_load(hass)
+        entity_helper.async_setup(hass)
+
+        entry = config_entries.ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title="Benchmark",
+            data={
+                CONF_USERNAME: portal.config.username,
+                CONF_PASSWORD: portal.config.password,
+                CONF_SELECTED_SITES: dict(portal.sites),
+                CONF_SELECTED_SENSORS: [],
+            },
+            source=config_entries.SOURCE_USER,
+            # Every refresh goes upstream; the benchmark measures the fetch
+            # path, not the freshness cache.
+            options={CONF_FRESHNESS_WINDOW: 0, CONF_SHARD_SITES: args.shard_sites},
+        )
+        config_entries.current_entry.set(entry)
+        # Registered directly rather than through async_add, which would
+        # set the integration up via the loader.
+        hass.config_entries = config_entries.ConfigEntries(hass, {})
+        hass.config_entries._entries[entry.entry_id] = entry
+
+        platform = EntityPlatform(
+            hass=hass,
+            logger=logging.getLogger(__name__),
+            domain="sensor",
+            platform_name=DOMAIN,
+            platform=None,
+            scan_interval=timedelta(seconds=30),
+            entity_namespace=None,
+        )
+        platform.config_entry = entry
+
+        probe = LoopLagProbe()
+        probe.start()
+
+        started = perf_counter()
+        await sensor.async_setup_entry(hass, entry, platform._async_schedule_add_entities)
+        await hass.async_block_till_done()
+        result.setup_s = perf_counter() - started
+        result.state_writes_setup = writes
+        result.entities = len(platform.entities)
+
+        hub = hass.data[DOMAIN][entry.entry_id]
+        # Refreshes are driven by hand, not by the coordinators' timers.
+        for coordinator in hub.coordinators.values():
+            coordinator.update_interval = None
+
+        writes = 0
+        probe.reset()
+        latencies = []
+        for _ in range(args.refreshes):
+            if args.expire_every and len(latencies) % args.expire_every == args.expire_every - 1:
+                portal.expire_sessions()
+            started = perf_counter()
+            await hub.async_refresh()
+            await hass.async_block_till_done()
+            latencies.append(perf_counter() - started)
+            if not hub.last_update_success:
+                result.failed_refreshes += 1
+
+        await probe.stop()
+
+        tracemalloc.start()
+        for _ in range(MEMORY_REFRESHES):
+            await hub.async_refresh()
+            await hass.async_block_till_done()
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result.refreshes = len(latencies)
+        result.refresh_p50_s = statistics.median(latencies) if latencies else 0.0
+        result.refresh_p95_s = _percentile(latencies, 95)
+        result.refresh_p99_s = _percentile(latencies, 99)
+        result.refresh_max_s = max(latencies, default=0.0)
+        result.state_writes_per_refresh = writes / max(1, len(latencies))
+        result.state_writes_per_entity = result.state_writes_per_refresh / max(1, result.entities)
+        result.suppressed_writes = hub.suppressed_writes
+        result.phases_p95_s = hub.refresh_stats.as_dict()["phases_p95"]
+        result.loop_blocked_s = probe.blocked
+        result.loop_max_stall_s = probe.max_stall
+        result.refresh_alloc_peak_mb = alloc_peak / 2**20
+        # ru_maxrss is in KiB on Linux.
+        result.peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        result.portal = asdict(portal.stats)
+        result.coordinator_loop_blocked_p95_s = hub.refresh_stats.percentile(95, attr="loop_blocked")
+
+        await hub.async_shutdown()
+        await platform.async_reset()
+        await async_release_account(hass, entry)
+        await hass.async_stop(force=True)
+
+    Entity.async_write_ha_state = write_state
+    await portal.stop()
+    return result
+
+
+def _check_budgets(result: BenchResult, args) -> list[str]:
+    budgets = (
+        ("setup_s", args.max_setup),
+        ("refresh_p95_s", args.max_refresh_p95),
+        ("state_writes_per_refresh", args.max_writes_per_refresh),
+        ("state_writes_per_entity", args.max_writes_per_entity),
+        ("loop_blocked_s", args.max_loop_blocked),
+        ("peak_rss_mb", args.max_memory_mb),
+    )
+    return [
+        f"{name} = {getattr(result, name):.4g} exceeds budget {limit:.4g}"
+        for name, limit in budgets
+        if limit is not None and getattr(result, name) > limit
+    ]
+
+
+def _print_report(result: BenchResult):
+    print(f"Omnisense refresh benchmark: {result.sites} sites x {result.sensors} sensors, "
+          f"{result.entities} entities")
+    print(f"  setup          {result.setup_s * 1000:9.1f} ms  ({result.state_writes_setup} state writes)")
+    print(f"  refresh p50    {result.refresh_p50_s * 1000:9.1f} ms")
+    print(f"  refresh p95    {result.refresh_p95_s * 1000:9.1f} ms")
+    print(f"  refresh p99    {result.refresh_p99_s * 1000:9.1f} ms")
+    print(f"  refresh max    {result.refresh_max_s * 1000:9.1f} ms  "
+          f"({result.refreshes} refreshes, {result.failed_refreshes} failed)")
+    phases = ", ".join(
+        f"{phase} {seconds * 1000:.1f}" for phase, seconds in result.phases_p95_s.items()
+        if seconds is not None
+    )
+    print(f"  phases p95     {phases} (ms)")
+    print(f"  state writes   {result.state_writes_per_refresh:9.1f} / refresh  "
+          f"({result.state_writes_per_entity:.2f} per entity, {result.suppressed_writes} suppressed)")
+    print(f"  loop blocked   {result.loop_blocked_s * 1000:9.1f} ms total, "
+          f"{result.loop_max_stall_s * 1000:.1f} ms worst, "
+          f"{(result.coordinator_loop_blocked_p95_s or 0) * 1000:.1f} ms p95 per refresh (watchdog)")
+    print(f"  peak memory    {result.peak_rss_mb:9.1f} MiB RSS, "
+          f"{result.refresh_alloc_peak_mb:.1f} MiB allocated per refresh")
+    print(f"  portal         {result.portal['sensor_page_requests']} sensor pages, "
+          f"{result.portal['logins']} logins, {result.portal['bytes_sent'] / 1024:.0f} KiB")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=3)
+    parser.add_argument("--sensors", type=int, default=20, help="sensors per site")
+    parser.add_argument("--refreshes", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="portal latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--session-ttl", type=float, default=None)
+    parser.add_argument("--expire-every", type=int, default=0,
+                        help="invalidate portal sessions every N refreshes")
+    parser.add_argument("--clock-step", type=float, default=60.0,
+                        help="simulated seconds per sensor page (controls change rate)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="serve the fake portal from the benchmark's own event loop")
+    parser.add_argument("--shard-sites", action="store_true",
+                        help="one coordinator per site (the shard_sites option)")
+    parser.add_argument("--etags", action="store_true",
+                        help="portal sends ETags and answers 304 for unchanged pages")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show integration logs")
+    parser.add_argument("--max-setup", type=float)
+    parser.add_argument("--max-refresh-p95", type=float)
+    parser.add_argument("--max-writes-per-refresh", type=float)
+    parser.add_argument("--max-writes-per-entity", type=float,
+                        help="state writes per refresh per entity, unaffected by adding entity types")
+    parser.add_argument("--max-loop-blocked", type=float)
+    parser.add_argument("--max-memory-mb", type=float)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+    if not args.verbose:
+        # Injected portal errors are expected; don't drown the report in them.
+        logging.getLogger("pyomnisense").setLevel(logging.CRITICAL)
+    result = asyncio.run(run_benchmark(args))
+
+    if args.json:
+        print(json.dumps(asdict(result), indent=2))
+    else:
+        _print_report(result)
+
+    failures = _check_budgets(result, args)
+    for failure in failures:
+        print(f"BUDGET EXCEEDED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""Synthetic stand-in for the OmniSense web portal.
+
+Serves the handful of pages pyomnisense scrapes (login, site list and the
+per-site sensor tables) for N sites x M sensors, entirely offline, with
+configurable latency, error rate and session expiry. Used by the
+benchmarks; it can also be run on its own to point a dev instance at::
+
+    python -m benchmarks.fake_portal --sites 3 --sensors 20 --port 8099
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import random
+import secrets
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+LOGIN_PATH = "/user_login.asp"
+SITE_LIST_PATH = "/site_select.asp"
+SENSOR_LIST_PATH = "/sensor_select.asp"
+
+SESSION_COOKIE = "ASPSESSIONIDOMNI"
+TOKEN_COOKIE = "userPNSToken"
+
+SENSOR_TYPES = ("1", "2", "4")
+
+
+@dataclass
+class PortalConfig:
+    sites: int = 3
+    sensors_per_site: int = 20
+    username: str = "bench@example.com"
+    password: str = "bench"
+    # Added to every response, in seconds: uniform(latency, latency + jitter).
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Probability that a sensor page answers 500 instead of the table.
+    error_rate: float = 0.0
+    # Sessions are bounced back to the login page after this many seconds.
+    session_ttl: float | None = None
+    # Sensors report every interval (seconds, simulated clock); the phase of
+    # each sensor is random so reports are spread across the interval.
+    report_interval: float = 600.0
+    # How far the simulated clock advances per sensor-page request.
+    clock_step: float = 60.0
+    # Send ETags on sensor pages and answer If-None-Match with 304. The real
+    # portal is not known to, so this is off by default.
+    etags: bool = False
+    seed: int = 1
+
+
+@dataclass
+class FakeSensor:
+    sid: str
+    description: str
+    sensor_type: str
+    phase: float
+    has_wood: bool
+    base_temp: float
+    base_rh: float
+
+
+@dataclass
+class PortalStats:
+    logins: int = 0
+    failed_logins: int = 0
+    site_list_requests: int = 0
+    sensor_page_requests: int = 0
+    expired_redirects: int = 0
+    injected_errors: int = 0
+    not_modified: int = 0
+    bytes_sent: int = 0
+    by_site: dict = field(default_factory=dict)
+
+
+class FakePortal:
+    """aiohttp application mimicking www.omnisense.com."""
+
+    def __init__(self, config: PortalConfig | None = None):
+        self.config = config or PortalConfig()
+        self.stats = PortalStats()
+        self._rng = random.Random(self.config.seed)
+        self._sessions: dict[str, float] = {}
+        self._epoch = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self._clock = 0.0
+
+        self.sites: dict[str, str] = {}
+        self.sensors: dict[str, list[FakeSensor]] = {}
+        for site_idx in range(self.config.sites):
+            site_id = str(1000 + site_idx)
+            self.sites[site_id] = f"Bench Site {site_idx}"
+            self.sensors[site_id] = [
+                FakeSensor(
+                    sid=f"{site_idx:03d}-{sensor_idx:04d}",
+                    description=f"Sensor {site_idx}.{sensor_idx}",
+                    sensor_type=self._rng.choice(SENSOR_TYPES),
+                    phase=self._rng.uniform(0, self.config.report_interval),
+                    has_wood=self._rng.random() < 0.3,
+                    base_temp=self._rng.uniform(-5, 25),
+                    base_rh=self._rng.uniform(30, 80),
+                )
+                for sensor_idx in range(self.config.sensors_per_site)
+            ]
+
+        self.app = web.Application()
+        self.app.router.add_post(LOGIN_PATH, self._login)
+        self.app.router.add_get(LOGIN_PATH, self._login_page)
+        self.app.router.add_get(SITE_LIST_PATH, self._site_list)
+        self.app.router.add_get(SENSOR_LIST_PATH, self._sensor_list)
+        self._runner: web.AppRunner | None = None
+        self.base_url: str | None = None
+
+    @property
+    def sensor_ids(self) -> list[str]:
+        return [s.sid for sensors in self.sensors.values() for s in sensors]
+
+    def expire_sessions(self) -> None:
+        """Invalidate every session, as the portal does on its own schedule."""
+        self._sessions.clear()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        # pyomnisense talks to "localhost": aiohttp refuses cookies from bare IPs.
+        self.base_url = f"http://localhost:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _delay(self):
+        if self.config.latency or self.config.jitter:
+            await asyncio.sleep(self.config.latency + self._rng.uniform(0, self.config.jitter))
+
+    def _html(self, body: str) -> web.Response:
+        self.stats.bytes_sent += len(body)
+        return web.Response(text=body, content_type="text/html")
+
+    def _session_ok(self, request: web.Request) -> bool:
+        started = self._sessions.get(request.cookies.get(SESSION_COOKIE, ""))
+        if started is None:
+            return False
+        ttl = self.config.session_ttl
+        return ttl is None or time.monotonic() - started < ttl
+
+    async def _login(self, request: web.Request) -> web.Response:
+        await self._delay()
+        form = await request.post()
+        response = web.HTTPFound(SITE_LIST_PATH)
+        if form.get("userId") != self.config.username or form.get("userPass") != self.config.password:
+            self.stats.failed_logins += 1
+            response = web.HTTPFound(LOGIN_PATH)
+            response.set_cookie(TOKEN_COOKIE, "LoginFailed")
+            return response
+
+        self.stats.logins += 1
+        session = secrets.token_urlsafe(12) + "=+"
+        self._sessions[session] = time.monotonic()
+        response.set_cookie(SESSION_COOKIE, session)
+        response.set_cookie(TOKEN_COOKIE, secrets.token_hex(8))
+        return response
+
+    async def _login_page(self, request: web.Request) -> web.Response:
+        return self._html("<html><head><title>Log-In</title></head><body>login</body></html>")
+
+    async def _site_list(self, request: web.Request) -> web.Response:
+        await self._delay()
+        if not self._session_ok(request):
+            self.stats.expired_redirects += 1
+            raise web.HTTPFound(LOGIN_PATH)
+        self.stats.site_list_requests += 1
+        links = "".join(
+            f"<tr><td><a href=\"#\" onclick=\"ShowSiteDetail('{site_id}')\">{name}</a></td></tr>"
+            for site_id, name in self.sites.items()
+        )
+        return self._html(f"<html><head><title>Sites</title></head><body><table>{links}</table></body></html>")
+
+    async def _sensor_list(self, request: web.Request) -> web.Response:
+        await self._delay()
+        if not self._session_ok(request):
+            self.stats.expired_redirects += 1
+            raise web.HTTPFound(LOGIN_PATH)
+
+        site_id = request.query.get("siteNbr", "")
+        if site_id not in self.sites:
+            return self._html("<html><head><title>Sensors for ?</title></head><body></body></html>")
+        if self.config.error_rate and self._rng.random() < self.config.error_rate:
+            self.stats.injected_errors += 1
+            raise web.HTTPInternalServerError()
+
+        self.stats.sensor_page_requests += 1
+        self.stats.by_site[site_id] = self.stats.by_site.get(site_id, 0) + 1
+        self._clock += self.config.clock_step
+        body = self.render_site(site_id)
+        if not self.config.etags:
+            return self._html(body)
+
+        etag = '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+        if request.headers.get("If-None-Match") == etag:
+            self.stats.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        response = self._html(body)
+        response.headers["ETag"] = etag
+        return response
+
+    def render_site(self, site_id: str) -> str:
+        """Render the sensor page for a site at the current simulated time."""
+        by_type: dict[str, list[str]] = {}
+        for sensor in self.sensors[site_id]:
+            by_type.setdefault(sensor.sensor_type, []).append(self._render_row(sensor))
+
+        tables = "".join(
+            f'<table class="sortable table" id="sensorType{sensor_type}">'
+            f"<caption>Sensor Type {sensor_type}</caption>"
+            "<tr><th>ID</th><th>Description</th><th>Last Activity</th><th>Status</th>"
+            "<th>Temp</th><th>RH</th><th>AH</th><th>Dew</th><th>Wood</th><th>Batt</th></tr>"
+            + "".join(rows)
+            + "</table>"
+            for sensor_type, rows in sorted(by_type.items())
+        )
+        return (
+            f"<html><head><title>Sensors for {self.sites[site_id]}</title></head>"
+            f"<body>{tables}</body></html>"
+        )
+
+    def _render_row(self, sensor: FakeSensor) -> str:
+        interval = self.config.report_interval
+        reports = int((self._clock - sensor.phase) // interval) if self._clock >= sensor.phase else -1
+        last = self._epoch + timedelta(seconds=sensor.phase + reports * interval)
+        # Readings are a deterministic function of the report number, so an
+        # unchanged last_activity means an unchanged row.
+        wobble = ((reports * 7919 + zlib.crc32(sensor.sid.encode())) % 100) / 100
+        temp = sensor.base_temp + wobble
+        rh = min(100.0, sensor.base_rh + wobble * 3)
+        cells = (
+            sensor.sid,
+            sensor.description,
+            last.strftime("%y-%m-%d %H:%M:%S"),
+            "OK",
+            f"{temp:.1f}",
+            f"{rh:.1f}",
+            f"{rh * 0.1:.2f}",
+            f"{temp - 5:.1f}",
+            f"{10 + wobble:.1f}" if sensor.has_wood else "",
+            f"{3.0 + wobble / 5:.2f}",
+        )
+        return '<tr class="sensorTable">' + "".join(f"<td>{c}</td>" for c in cells) + "</tr>"
+
+
+def _portal_process_main(config: PortalConfig, conn) -> None:
+    async def run():
+        portal = FakePortal(config)
+        conn.send((await portal.start(), portal.sites))
+        stopped = asyncio.Event()
+
+        def on_command():
+            command = conn.recv()
+            if command == "expire":
+                portal.expire_sessions()
+                conn.send(None)
+            elif command == "stats":
+                conn.send(portal.stats)
+            else:
+                stopped.set()
+
+        asyncio.get_running_loop().add_reader(conn.fileno(), on_command)
+        await stopped.wait()
+        await portal.stop()
+        conn.send(None)
+
+    asyncio.run(run())
+
+
+class PortalProcess:
+    """A FakePortal running in a child process.
+
+    Same surface as FakePortal as far as the benchmarks are concerned, but
+    rendering pages and serving sockets no longer competes with the code
+    being measured for the event loop and the GIL.
+    """
+
+    def __init__(self, config: PortalConfig | None = None):
+        self.config = config or PortalConfig()
+        self.sites: dict[str, str] = {}
+        self.base_url: str | None = None
+        self._conn = None
+        self._process = None
+
+    async def start(self) -> str:
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_portal_process_main, args=(self.config, child), daemon=True
+        )
+        self._process.start()
+        self.base_url, self.sites = await asyncio.get_running_loop().run_in_executor(
+            None, self._conn.recv
+        )
+        return self.base_url
+
+    def _call(self, command):
+        self._conn.send(command)
+        return self._conn.recv()
+
+    def expire_sessions(self) -> None:
+        self._call("expire")
+
+    @property
+    def stats(self) -> PortalStats:
+        return self._call("stats")
+
+    async def stop(self) -> None:
+        if self._process is None:
+            return
+        self._call("stop")
+        self._process.join(5)
+        self._process = None
+
+
+def point_pyomnisense_at(base_url: str) -> None:
+    """Redirect pyomnisense (and with it the integration) to ``base_url``."""
+    from pyomnisense import omnisense
+
+    omnisense.HOST_URL = base_url
+    omnisense.LOGIN_URL = base_url + LOGIN_PATH
+    omnisense.SITE_LIST_URL = base_url + SITE_LIST_PATH
+    omnisense.SENSOR_LIST_URL = base_url + SENSOR_LIST_PATH
+
+
+async def _serve(args):
+    portal = FakePortal(PortalConfig(
+        sites=args.sites,
+        sensors_per_site=args.sensors,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        session_ttl=args.session_ttl,
+    ))
+    url = await portal.start(port=args.port)
+    print(f"Fake OmniSense portal on {url} ({portal.config.username} / {portal.config.password})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await portal.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=3)
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--session-ttl", type=float, default=None)
+    parser.add_argument("--port", type=int, default=8099)
+    asyncio.run(_serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,10 @@ import asyncio
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.const import Platform
+from homeassistant.const import Platform, CONF_USERNAME
+
+from .const import CONF_SELECTED_SITES
+from .store import SensorCache, SessionStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -14,15 +17,32 @@ PLATFORMS = [Platform.SENSOR]
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Omnisense from a config entry."""
     hass.data.setdefault(DOMAIN, {})
-    # The coordinator (created by the sensor platform) will register
-    # itself at hass.data[DOMAIN][entry.entry_id].
+    # The hub and its coordinators (created by the sensor platform) will
+    # register at hass.data[DOMAIN][entry.entry_id].
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    entry.async_on_unload(entry.add_update_listener(async_options_updated))
+
     return True
 
+async def async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options to the running coordinators.
+
+    Selection and tuning changes are applied in place, so existing entities
+    and the portal session survive. A missing hub (setup still pending or
+    failed) or a change to how the entry is sharded falls back to a reload.
+    """
+    hub = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if hub is None or not hub.async_apply_options(entry):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    await hub.async_request_refresh()
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
+    from .account import async_release_account
+
     unload_ok = all(
         await asyncio.gather(
             *[
@@ -32,11 +52,30 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         )
     )
     if unload_ok:
-        coordinator = hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
-        if coordinator is not None and getattr(coordinator, "omnisense", None) is not None:
-            try:
-                await coordinator.omnisense.close()
-            except Exception as err:  # pragma: no cover - best-effort cleanup
-                _LOGGER.warning("Error closing Omnisense session on unload: %s", err)
+        hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+        # The client is shared per account; it is only closed once the last
+        # entry using it is gone.
+        try:
+            await async_release_account(hass, entry)
+        except Exception as err:  # pragma: no cover - best-effort cleanup
+            _LOGGER.warning("Error closing Omnisense session on unload: %s", err)
 
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Drop the persisted sensor catalog and session when the entry is deleted."""
+    from .account import account_key
+
+    await SensorCache(hass, entry.entry_id).async_remove()
+    # Shards follow the sites picked in options, if any, as well as the
+    # ones picked when the entry was created.
+    sites = set(entry.data.get(CONF_SELECTED_SITES, []))
+    sites.update(entry.options.get(CONF_SELECTED_SITES) or [])
+    for site_id in sites:
+        await SensorCache(hass, entry.entry_id, site_id).async_remove()
+    # The session belongs to the account, which other entries may share.
+    if not any(
+        other.entry_id != entry.entry_id and account_key(other) == account_key(entry)
+        for other in hass.config_entries.async_entries(DOMAIN)
+    ):
+        await SessionStore(hass, entry.data.get(CONF_USERNAME)).async_remove()
@@ -0,0 +1,469 @@
+"""Account-level Omnisense client shared by every config entry of a user."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from time import monotonic, perf_counter
+
+import aiohttp
+import async_timeout
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+
+from .breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker
+from .const import (
+    DOMAIN,
+    CONF_MAX_PARALLEL_SITES,
+    DEFAULT_MAX_PARALLEL_SITES,
+    SITE_FETCH_TIMEOUT,
+)
+from .stats import FetchMeter, SiteTiming, current_meter
+from .store import SessionStore
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ACCOUNTS = "accounts"
+# Breakers outlive the account they guard, so unloading and reloading an
+# entry can't be used to retry a locked-out portal in a tight loop.
+DATA_BREAKERS = "breakers"
+
+# How long a fetch request waits for other entries of the same account to
+# join it before the combined round goes out (seconds). Only applies when
+# more than one entry shares the account.
+BATCH_WINDOW = 0.5
+
+# Page parsing runs in HA's executor threads. html.parser holds the GIL for
+# long stretches though, so once an account serves this many sites it gets
+# a small process pool of its own and the event loop stays responsive.
+PARSE_POOL_MIN_SITES = 4
+PARSE_POOL_WORKERS = 2
+
+
+class SiteFetchError(Exception):
+    """A single site could not be fetched."""
+
+    def __init__(self, site_id):
+        super().__init__(site_id)
+        self.site_id = site_id
+
+
+class PortalUnavailable(Exception):
+    """The circuit breaker is holding requests back."""
+
+    def __init__(self, breaker: CircuitBreaker):
+        super().__init__(
+            f"Omnisense portal unavailable ({breaker.last_error}), "
+            f"next retry at {breaker.retry_at.isoformat(timespec='seconds') if breaker.retry_at else 'once probed'}"
+        )
+        self.retry_at = breaker.retry_at
+
+
+class _FetchRound:
+    """Sites of one upstream round still outstanding, and whether any succeeded.
+
+    ``full`` is False when only partial requests (a priority tier's sites)
+    went into the round.
+    """
+
+    __slots__ = ("remaining", "succeeded", "full")
+
+    def __init__(self, sites: int, full: bool = True):
+        self.remaining = sites
+        self.succeeded = False
+        self.full = full
+
+
+class OmnisenseAccount:
+    """One logged-in Omnisense client plus fetch batching for an account.
+
+    Entries split by site all talk to the same portal account; sharing the
+    client means one HTTP session, one connection pool and one login, and
+    site requests that arrive within BATCH_WINDOW of each other are sent
+    upstream as a single round.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        username: str,
+        password: str,
+        max_parallel: int,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.hass = hass
+        self.username = username
+        self.password = password
+        # pyomnisense (and BeautifulSoup with it) is only loaded once an
+        # account is actually needed, not with the sensor platform.
+        from .client import OmnisenseClient
+
+        self.client = OmnisenseClient()
+        # Scraping a large site page takes long enough to be felt by every
+        # other integration; keep it off the event loop.
+        self.client.parse_executor = self._async_parse
+        self._parse_pool = None
+        self._parse_pool_broken = False
+        self.entries: set[str] = set()
+
+        self._session_store = SessionStore(hass, username)
+        self._session_restored = False
+        self._saved_login_count = 0
+        self.logged_in = False
+        # Entries and site shards log in concurrently at startup; a second
+        # login would invalidate the session the first one just got.
+        self._login_lock = asyncio.Lock()
+        self.breaker = breaker or CircuitBreaker()
+        self._probe: asyncio.Task | None = None
+
+        self._max_parallel = max_parallel
+        self._semaphore = asyncio.Semaphore(max_parallel)
+        self._pending: dict[str, asyncio.Future] = {}
+        self._pending_full = False
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # Single-flight state: fetches currently running, the last good
+        # result per site (monotonic time, data), and how many site
+        # requests were answered without a fetch of their own.
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._fresh: dict[str, tuple[float, dict]] = {}
+        self.coalesced_requests = 0
+        # Where the last fetch of each site spent its time.
+        self.site_timings: dict[str, SiteTiming] = {}
+
+    async def async_login(self):
+        """Make sure the client has a session, reusing a saved one if possible.
+
+        Raises ``OmnisenseAuthError`` / ``OmnisenseError`` from pyomnisense,
+        ``OmnisenseAuthError`` if the credentials were rejected, or the
+        ``aiohttp.ClientError`` / ``asyncio.TimeoutError`` of a login that
+        never reached the portal.
+        """
+        async with self._login_lock:
+            await self._async_login()
+
+    async def _async_login(self):
+        from pyomnisense import OmnisenseAuthError, OmnisenseError
+
+        if self.logged_in:
+            return
+
+        # Reuse the session saved by the last run (or by the config flow)
+        # instead of logging in; pyomnisense re-authenticates on its own if
+        # the portal no longer accepts it.
+        cookies = await self._session_store.async_load()
+        if cookies and not self._session_restored:
+            self._session_restored = True
+            self.client.restore_session(self.username, self.password, cookies)
+            self._saved_login_count = self.client.login_count
+            self.logged_in = True
+            return
+
+        try:
+            logged_in = await self.client.login(self.username, self.password)
+        except OmnisenseAuthError as err:
+            self.breaker.record_failure(f"login: {err}", auth=True)
+            raise
+        except (OmnisenseError, asyncio.TimeoutError, aiohttp.ClientError) as err:
+            self.breaker.record_failure(f"login: {err or type(err).__name__}")
+            raise
+        if not logged_in:
+            self.breaker.record_failure("login: credentials rejected", auth=True)
+            raise OmnisenseAuthError("Credentials rejected")
+        self.logged_in = True
+
+    async def async_guard(self, site_ids):
+        """Let a refresh through only if the breaker allows it.
+
+        While the breaker is open this raises ``PortalUnavailable`` without
+        any I/O. Once it is due, the first caller probes a single site,
+        the one that last fetched fine, and everyone else waits for that
+        probe instead of going upstream too.
+        """
+        breaker = self.breaker
+        if breaker.state == STATE_CLOSED:
+            return
+        if breaker.state == STATE_OPEN and not breaker.due():
+            raise PortalUnavailable(breaker)
+        if self._probe is None:
+            breaker.half_open()
+            self._probe = self.hass.async_create_task(self._async_probe(site_ids))
+        await asyncio.shield(self._probe)
+        if breaker.state != STATE_CLOSED:
+            raise PortalUnavailable(breaker)
+
+    async def _async_probe(self, site_ids):
+        site_id = max(self._fresh, key=lambda site: self._fresh[site][0]) if self._fresh else site_ids[0]
+        _LOGGER.debug("Probing Omnisense site %s before resuming refreshes", site_id)
+        try:
+            await self.async_login()
+            await self.async_request_sites([site_id])[site_id]
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.debug("Omnisense probe failed: %s", err)
+        finally:
+            self._probe = None
+            # A probe that neither closed the breaker nor had its failure
+            # recorded (cancelled, or an error nobody counted) must still
+            # open it again; left half-open, every refresh would probe.
+            if self.breaker.state == STATE_HALF_OPEN:
+                self.breaker.record_failure("probe did not complete")
+
+    @property
+    def max_parallel(self) -> int:
+        return self._max_parallel
+
+    def set_max_parallel(self, max_parallel: int):
+        """Resize the fetch pool; fetches already running finish on the old one."""
+        if max_parallel != self._max_parallel:
+            self._max_parallel = max_parallel
+            self._semaphore = asyncio.Semaphore(max_parallel)
+
+    def set_parser(self, parser: str):
+        """Pick the page parser backend used for this account's sites."""
+        self.client.parser = parser
+
+    async def async_auth_failed(self):
+        """Forget the session so the next refresh starts with a clean login."""
+        self.logged_in = False
+        await self._session_store.async_remove()
+
+    async def async_save_session(self):
+        """Persist the session cookies if we logged in since the last save."""
+        if self.client.login_count != self._saved_login_count:
+            self._saved_login_count = self.client.login_count
+            await self._session_store.async_save(self.client.session_cookies())
+
+    async def async_site_sensors(self, site_id):
+        """Every sensor on one site's page, from the last good fetch if any.
+
+        Used by the options flow, which lists sensors the entry doesn't
+        poll as well as those it does.
+        """
+        fetched = self._fresh.get(site_id)
+        if fetched is not None:
+            return fetched[1]
+        await self.async_guard([site_id])
+        await self.async_login()
+        return await self.async_request_sites([site_id])[site_id]
+
+    @callback
+    def async_request_sites(self, site_ids, max_age=0, partial=False) -> dict[str, asyncio.Future]:
+        """Queue the given sites for the next upstream round.
+
+        Returns ``{site_id: future}``; each future resolves to that site's
+        readings (``{sensor_id: reading}`` for every sensor on the page) or
+        fails with ``SiteFetchError``. An unchanged page resolves to the
+        same dict object as the previous fetch.
+
+        Requests are single-flight: a site that is already queued or in
+        flight shares that future instead of starting another fetch, and a
+        site fetched successfully within the last ``max_age`` seconds is
+        served from that result without going upstream at all.
+
+        ``partial`` marks the sites as only some of those the caller polls,
+        e.g. one priority tier's. A round made up of partial requests only
+        says little about the portal, so its failure counts against the
+        breaker only if the portal rejected the login.
+        """
+        loop = self.hass.loop
+        now = monotonic()
+        futures = {}
+        for site_id in site_ids:
+            future = self._pending.get(site_id) or self._inflight.get(site_id)
+            if future is None and max_age:
+                fetched = self._fresh.get(site_id)
+                if fetched is not None and now - fetched[0] <= max_age:
+                    future = loop.create_future()
+                    future.set_result(fetched[1])
+            if future is None:
+                future = self._pending[site_id] = loop.create_future()
+            else:
+                self.coalesced_requests += 1
+            if not partial and future is self._pending.get(site_id):
+                self._pending_full = True
+            futures[site_id] = future
+
+        if self._pending and self._flush_handle is None:
+            delay = BATCH_WINDOW if len(self.entries) > 1 else 0
+            self._flush_handle = loop.call_later(delay, self._flush)
+        return futures
+
+    @callback
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        self._inflight.update(pending)
+        self._flush_handle = None
+        _LOGGER.debug("Fetching %d site(s) for %s in one round", len(pending), self.username)
+        fetch_round = _FetchRound(len(pending), self._pending_full)
+        self._pending_full = False
+        for site_id, future in pending.items():
+            self.hass.async_create_task(self._async_fetch_into(site_id, future, fetch_round))
+
+    async def _async_fetch_into(self, site_id, future, fetch_round):
+        from pyomnisense import OmnisenseAuthError
+
+        try:
+            result = await self._async_fetch_site(site_id)
+        except SiteFetchError as err:
+            # One bad site is that site's problem; a round in which every
+            # site failed counts against the portal.
+            fetch_round.remaining -= 1
+            try:
+                cause = err.__cause__
+                auth = isinstance(cause, OmnisenseAuthError)
+                if not fetch_round.remaining and not fetch_round.succeeded and (fetch_round.full or auth):
+                    self.breaker.record_failure(
+                        f"site {site_id}: {cause or 'no sensor data'}", auth=auth
+                    )
+            finally:
+                if not future.done():
+                    future.set_exception(err)
+        except Exception:  # pylint: disable=broad-except
+            # Whoever shares this future (refreshes, the breaker probe)
+            # must never be left waiting on it.
+            fetch_round.remaining -= 1
+            _LOGGER.exception("Unexpected error fetching Omnisense site %s", site_id)
+            if not future.done():
+                future.set_exception(SiteFetchError(site_id))
+        else:
+            fetch_round.remaining -= 1
+            fetch_round.succeeded = True
+            self.breaker.record_success()
+            self._fresh[site_id] = (monotonic(), result)
+            if not future.done():
+                future.set_result(result)
+        finally:
+            if self._inflight.get(site_id) is future:
+                del self._inflight[site_id]
+
+    async def _async_fetch_site(self, site_id):
+        """Fetch one site's readings, retrying once after a re-login."""
+        login_count = self.client.login_count
+        try:
+            return await self._async_fetch_site_once(site_id)
+        except SiteFetchError:
+            if self.client.login_count == login_count:
+                raise
+        # The session was re-established while this request was in flight
+        # (which closes the old one under it); retry once on the new one.
+        _LOGGER.debug("Retrying site %s after re-authentication", site_id)
+        return await self._async_fetch_site_once(site_id)
+
+    async def _async_fetch_site_once(self, site_id):
+        """Fetch one site's readings, bounded by the account semaphore."""
+        from pyomnisense import OmnisenseError
+
+        async with self._semaphore:
+            meter = FetchMeter()
+            token = current_meter.set(meter)
+            started = perf_counter()
+            try:
+                async with async_timeout.timeout(SITE_FETCH_TIMEOUT):
+                    # Every sensor on the page comes back; entries filter
+                    # their own selection, so one fetch can serve them all.
+                    site_data, changed = await self.client.get_site_data(site_id)
+            except (OmnisenseError, asyncio.TimeoutError, aiohttp.ClientError) as err:
+                _LOGGER.warning("Error fetching sensor data for site %s: %s", site_id, err)
+                raise SiteFetchError(site_id) from err
+            finally:
+                current_meter.reset(token)
+
+        # Whatever get_site_data spent outside HTTP is parsing.
+        self.site_timings[site_id] = SiteTiming(
+            http=meter.http,
+            parse=perf_counter() - started - meter.http,
+            bytes=meter.bytes,
+            changed=changed,
+        )
+
+        # A page without a single sensor row is the portal having a bad
+        # moment, not an empty site.
+        if not site_data:
+            _LOGGER.warning("No sensor data returned for site %s", site_id)
+            raise SiteFetchError(site_id)
+
+        return site_data
+
+    async def _async_parse(self, func, *args):
+        """Run a page parser off the event loop."""
+        if len(self.site_timings) < PARSE_POOL_MIN_SITES or self._parse_pool_broken:
+            return await self.hass.async_add_executor_job(func, *args)
+
+        # Most accounts never get this far; don't load multiprocessing for them.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        if self._parse_pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._parse_pool = ProcessPoolExecutor(PARSE_POOL_WORKERS, mp_context=context)
+            _LOGGER.debug("Parsing Omnisense pages for %s in a process pool", self.username)
+        try:
+            return await self.hass.loop.run_in_executor(self._parse_pool, func, *args)
+        except (BrokenProcessPool, OSError) as err:
+            _LOGGER.warning("Omnisense parse pool unavailable, parsing in threads instead: %s", err)
+            self._parse_pool_broken = True
+            self._shutdown_parse_pool()
+            return await self.hass.async_add_executor_job(func, *args)
+
+    def _shutdown_parse_pool(self):
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    async def async_close(self):
+        self._shutdown_parse_pool()
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for future in (*self._pending.values(), *self._inflight.values()):
+            future.cancel()
+        self._pending = {}
+        self._inflight = {}
+        await self.client.close()
+
+
+def account_key(entry) -> str:
+    """Key of the portal account an entry uses: its normalised username."""
+    return (entry.data.get(CONF_USERNAME) or "").strip().lower()
+
+
+def async_get_account(hass: HomeAssistant, entry) -> OmnisenseAccount:
+    """Return the shared account for ``entry``, registering the entry on it."""
+    accounts = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_ACCOUNTS, {})
+    username = entry.data.get(CONF_USERNAME)
+    key = account_key(entry)
+    account = accounts.get(key)
+    if account is None:
+        breakers = hass.data[DOMAIN].setdefault(DATA_BREAKERS, {})
+        account = accounts[key] = OmnisenseAccount(
+            hass,
+            username,
+            entry.data.get(CONF_PASSWORD),
+            entry.options.get(CONF_MAX_PARALLEL_SITES, DEFAULT_MAX_PARALLEL_SITES),
+            breakers.setdefault(key, CircuitBreaker()),
+        )
+    account.entries.add(entry.entry_id)
+    return account
+
+
+@callback
+def async_loaded_account(hass: HomeAssistant, entry) -> OmnisenseAccount | None:
+    """Return the running account for ``entry`` without registering on it."""
+    return hass.data.get(DOMAIN, {}).get(DATA_ACCOUNTS, {}).get(account_key(entry))
+
+
+async def async_release_account(hass: HomeAssistant, entry) -> None:
+    """Drop ``entry``'s reference, closing the client after the last one."""
+    accounts = hass.data.get(DOMAIN, {}).get(DATA_ACCOUNTS, {})
+    key = account_key(entry)
+    account = accounts.get(key)
+    if account is None:
+        return
+    account.entries.discard(entry.entry_id)
+    if not account.entries:
+        del accounts[key]
+        await account.async_close()
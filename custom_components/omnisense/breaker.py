@@ -0,0 +1,119 @@
+"""Circuit breaker around the portal, shared by every entry of an account.
+
+Closed, requests flow. After ``FAILURE_THRESHOLD`` failures in a row (a
+login, or a fetch round in which every site failed) it opens and nothing
+goes upstream until the retry time, which backs off exponentially, with
+jitter, on every trip. Rejected credentials open it straight away and
+back off far longer: retrying them in a tight loop is what gets an
+account locked. Once the retry time has passed, a single probe is let
+through (half-open); success closes the breaker, failure opens it again
+for longer.
+"""
+from __future__ import annotations
+
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Consecutive transient failures before the breaker opens.
+FAILURE_THRESHOLD = 3
+
+# Cap on the backoff exponent. Any real cap is reached long before this;
+# it only keeps the delay from overflowing after days of failed probes.
+MAX_BACKOFF_EXPONENT = 16
+
+
+@dataclass(frozen=True)
+class Backoff:
+    """Exponential backoff between ``base`` and ``cap``."""
+
+    base: timedelta
+    cap: timedelta
+
+    def delay(self, trips: int, rng=random.random) -> timedelta:
+        delay = min(self.cap, self.base * 2 ** min(max(0, trips - 1), MAX_BACKOFF_EXPONENT))
+        # Equal jitter: never less than half the delay, so accounts that
+        # failed together don't all come back at the same instant.
+        return delay / 2 + delay / 2 * rng()
+
+
+TRANSIENT_BACKOFF = Backoff(timedelta(seconds=30), timedelta(minutes=30))
+AUTH_BACKOFF = Backoff(timedelta(minutes=15), timedelta(hours=6))
+
+
+class CircuitBreaker:
+    """Breaker state for one portal account."""
+
+    def __init__(self, rng=random.random):
+        self.state = STATE_CLOSED
+        # Consecutive failures since the last success, and how often the
+        # breaker opened since then (the backoff exponent).
+        self.failures = 0
+        self.trips = 0
+        self.auth_failed = False
+        self.retry_at: datetime | None = None
+        self.last_error: str | None = None
+        self._rng = rng
+
+    def due(self, now: datetime | None = None) -> bool:
+        """Whether an open breaker may be probed."""
+        return self.retry_at is None or (now or dt_util.utcnow()) >= self.retry_at
+
+    def retry_in(self, now: datetime | None = None) -> timedelta:
+        if self.retry_at is None:
+            return timedelta(0)
+        return max(timedelta(0), self.retry_at - (now or dt_util.utcnow()))
+
+    def half_open(self):
+        """Let one probe through."""
+        self.state = STATE_HALF_OPEN
+
+    def record_success(self):
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("Omnisense portal is reachable again, resuming refreshes")
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.auth_failed = False
+        self.retry_at = None
+
+    def record_failure(self, reason: str, auth: bool = False):
+        # A request that was already under way when the breaker opened
+        # tells us nothing new.
+        if self.state == STATE_OPEN:
+            return
+        self.last_error = reason
+        self.failures += 1
+        if self.state == STATE_CLOSED and not auth and self.failures < FAILURE_THRESHOLD:
+            return
+
+        self.trips += 1
+        self.auth_failed = auth
+        backoff = AUTH_BACKOFF if auth else TRANSIENT_BACKOFF
+        self.retry_at = dt_util.utcnow() + backoff.delay(self.trips, self._rng)
+        self.state = STATE_OPEN
+        _LOGGER.warning(
+            "Omnisense %s (%s); holding off until %s",
+            "login rejected" if auth else f"portal failed {self.failures} time(s) in a row",
+            reason,
+            self.retry_at.isoformat(timespec="seconds"),
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "auth_failed": self.auth_failed,
+            "retry_at": self.retry_at.isoformat() if self.retry_at else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,193 @@
+"""pyomnisense client with a persistable, lazily re-authenticated session."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from time import perf_counter
+
+import aiohttp
+from pyomnisense import Omnisense, OmnisenseAuthError, OmnisenseError
+from pyomnisense import omnisense as omnisense_api
+from yarl import URL
+
+from .const import DEFAULT_PARSER
+from .parser import parse_sensor_page
+from .stats import current_meter
+
+_LOGGER = logging.getLogger(__name__)
+
+# Connection pool for the portal. Site pages are fetched in parallel, so
+# keep enough connections per host and keep them alive between rounds.
+CONNECTIONS_PER_HOST = 8
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = 30
+
+# Where the portal bounces requests whose session has expired.
+LOGIN_PATH = "/user_login.asp"
+
+
+@dataclass
+class _CachedPage:
+    """Last sensor page seen for a site, and what it parsed to."""
+
+    digest: bytes
+    etag: str | None
+    last_modified: str | None
+    data: dict
+
+
+class OmnisenseClient(Omnisense):
+    """Omnisense client whose session cookies can be saved and restored.
+
+    pyomnisense re-logs in with its cached credentials whenever the portal
+    bounces a request to the login page. That makes a restored session safe
+    to use optimistically: if the portal rejects it, the first fetch logs in
+    again and retries. Logins are serialised so concurrent site fetches that
+    all notice an expired session trigger a single login, and
+    ``login_count`` lets callers tell that the session was replaced while
+    their request was in flight.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._login_lock = asyncio.Lock()
+        self.login_count = 0
+        self._page_cache: dict[str, _CachedPage] = {}
+        # ``async (func, *args) -> result`` used to run page parsing off the
+        # event loop, e.g. ``hass.async_add_executor_job``. None parses
+        # inline.
+        self.parse_executor = None
+        self.parser = DEFAULT_PARSER
+
+    def _open_session(self) -> None:
+        # Same session pyomnisense builds (quote_cookie=False matters for the
+        # portal's ASP cookies), on a pooled keep-alive connector.
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=CONNECTIONS_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            cookie_jar=aiohttp.CookieJar(quote_cookie=False),
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+
+    async def get_site_data(self, site_id: str) -> tuple[dict, bool]:
+        """Return ``(readings, changed)`` for every sensor on one site.
+
+        The page is only parsed when it differs from the last one fetched
+        for the site: a 304 to the portal's validators (if it sends any) or
+        an identical body returns the previously parsed readings, the very
+        same dict, with ``changed`` False.
+
+        Raises ``OmnisenseAuthError`` if the session cannot be re-established
+        and ``OmnisenseError`` for anything else that went wrong.
+        """
+        cached = self._page_cache.get(site_id)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        status, body, encoding, resp_headers = await self._fetch_page(
+            f"{omnisense_api.SENSOR_LIST_URL}?siteNbr={site_id}", headers
+        )
+        if status == 304 and cached is not None:
+            return cached.data, False
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        etag = resp_headers.get("ETag")
+        last_modified = resp_headers.get("Last-Modified")
+        if cached is not None and cached.digest == digest:
+            cached.etag, cached.last_modified = etag, last_modified
+            return cached.data, False
+
+        try:
+            if self.parse_executor is None:
+                data = parse_sensor_page(body, encoding, self.parser)
+            else:
+                data = await self.parse_executor(parse_sensor_page, body, encoding, self.parser)
+        except Exception as err:
+            raise OmnisenseError(f"Could not parse sensor page for site {site_id}: {err}") from err
+        self._page_cache[site_id] = _CachedPage(digest, etag, last_modified, data)
+        return data, True
+
+    async def _fetch_page(self, url: str, headers: dict):
+        """Conditional GET returning ``(status, body, encoding, headers)``.
+
+        The body is left as raw bytes; decoding is part of parsing.
+
+        Mirrors pyomnisense's ``_fetch_html`` (including the one re-login
+        when bounced to the login page) but lets a 304 through.
+        """
+        await self._ensure_session()
+        meter = current_meter.get()
+        started = perf_counter()
+
+        for attempt in (0, 1):
+            async with self._session.get(url, headers=headers) as resp:
+                if resp.status not in (200, 304):
+                    raise OmnisenseError(f"GET {url} returned status {resp.status}")
+                if LOGIN_PATH in str(resp.url):
+                    if attempt == 0:
+                        _LOGGER.info("Session expired; re-logging in.")
+                        if not await self.login():
+                            raise OmnisenseAuthError("Re-login failed.")
+                        continue
+                    raise OmnisenseAuthError(
+                        "Server kept redirecting to the login page after re-login."
+                    )
+                body = await resp.read() if resp.status == 200 else b""
+                if meter is not None:
+                    meter.http += perf_counter() - started
+                    meter.bytes += len(body)
+                    meter.requests += 1
+                # Not resp.get_encoding(): without a charset it sniffs the
+                # body, on the event loop.
+                return resp.status, body, resp.charset or "utf-8", resp.headers
+
+        raise OmnisenseError("unreachable")
+
+    @property
+    def has_session(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def login(self, username=None, password=None) -> bool:
+        generation = self.login_count
+        async with self._login_lock:
+            if username is None and generation != self.login_count and self.has_session:
+                # Someone else re-authenticated while we waited for the lock.
+                return True
+            success = await super().login(username, password)
+            if success:
+                self.login_count += 1
+                _LOGGER.debug("Logged in to Omnisense (login #%d)", self.login_count)
+            return success
+
+    def restore_session(self, username: str, password: str, cookies: dict) -> None:
+        """Adopt saved cookies without contacting the portal.
+
+        The credentials are kept so the session can be re-established
+        transparently if the portal no longer accepts the cookies.
+        """
+        self._username = username
+        self._password = password
+        if self.has_session:
+            return
+        self._open_session()
+        self._session.cookie_jar.update_cookies(cookies, URL(omnisense_api.HOST_URL))
+
+    def session_cookies(self) -> dict:
+        """Return the current portal cookies as ``{name: value}``."""
+        if not self.has_session:
+            return {}
+        return {
+            name: morsel.value
+            for name, morsel in self._session.cookie_jar.filter_cookies(
+                URL(omnisense_api.HOST_URL)
+            ).items()
+        }
@@ -3,24 +3,81 @@ import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+from homeassistant.core import callback
 from .const import CONF_SELECTED_SITES, CONF_SELECTED_SENSORS
+from .const import (
+    CONF_MIN_POLL_INTERVAL,
+    CONF_MAX_POLL_INTERVAL,
+    DEFAULT_MIN_POLL_INTERVAL,
+    DEFAULT_MAX_POLL_INTERVAL,
+    CONF_MAX_PARALLEL_SITES,
+    DEFAULT_MAX_PARALLEL_SITES,
+    CONF_SHARD_SITES,
+    DEFAULT_SHARD_SITES,
+    CONF_TEMPERATURE_DEADBAND,
+    CONF_HUMIDITY_DEADBAND,
+    CONF_FRESHNESS_WINDOW,
+    DEFAULT_FRESHNESS_WINDOW,
+    CONF_PARSER,
+    DEFAULT_PARSER,
+    PARSER_BACKENDS,
+    CONF_BATTERY_CURVE,
+    CONF_TEMPERATURE_THRESHOLD,
+    CONF_HUMIDITY_THRESHOLD,
+    CONF_WOOD_MOISTURE_THRESHOLD,
+    DEFAULT_THRESHOLDS,
+    CONF_SITE_FILTER,
+    CONF_TYPE_FILTER,
+    CONF_SEARCH,
+    CONF_SELECT_ALL_SITES,
+    CONF_CRITICAL_SENSORS,
+    CONF_LOW_PRIORITY_SENSORS,
+    CONF_CRITICAL_INTERVAL,
+    CONF_LOW_PRIORITY_INTERVAL,
+    DEFAULT_CRITICAL_INTERVAL,
+    DEFAULT_LOW_PRIORITY_INTERVAL,
+)
+from .account import async_loaded_account
+from .discovery import SENSOR_LIST_LIMIT, SensorDiscovery, SensorFilter, sensor_label
+from .derive import DEFAULT_BATTERY_CURVE, format_battery_curve, parse_battery_curve
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.selector import SelectSelector
-from pyomnisense import Omnisense, OmnisenseAuthError, OmnisenseError
 
 _LOGGER = logging.getLogger(__name__)
 
 from .const import DOMAIN
+from .store import SessionStore
 
 class OmnisenseConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
     MINOR_VERSION = 1
 
     def __init__(self):
-        self.omnisense = Omnisense()
+        # pyomnisense and BeautifulSoup are loaded when a flow starts, not
+        # when HA looks the handler up.
+        from .client import OmnisenseClient
+
+        self.omnisense = OmnisenseClient()
+        # Sensor pages fetched during this flow, and the picker state kept
+        # across renders of the sensors step.
+        self._discovery = SensorDiscovery(self._async_fetch_site)
+        self._filter = SensorFilter()
+        self._listed = []
+        self._chosen = set()
+
+    async def _async_fetch_site(self, site_id):
+        site_data, _ = await self.omnisense.get_site_data(site_id)
+        return site_data
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return OmnisenseOptionsFlow(config_entry)
 
     async def async_step_user(self, user_input=None):
         """Handle the initial step where the user enters credentials."""
+        from pyomnisense import OmnisenseAuthError, OmnisenseError
+
         errors = {}
         if user_input is not None:
             self.username = user_input.get(CONF_USERNAME)
@@ -40,6 +97,10 @@ class OmnisenseConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors["base"] = "omnisense_login_failed"
 
             if not errors:
+                # Hand the session over to the entry we're about to create
+                # so it doesn't have to log in again on setup.
+                await SessionStore(self.hass, self.username).async_save(self.omnisense.session_cookies())
+
                 try:
                     sites = await self.omnisense.get_site_list()
                     if sites:
@@ -80,45 +141,79 @@ class OmnisenseConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_show_form(step_id="select_site", data_schema=schema, errors=errors)
 
     async def async_step_sensors(self, user_input=None):
-        """Handle the sensor selection step."""
+        """Handle the sensor selection step.
+
+        Submitting with a changed filter, or with sites picked under
+        "select all", shows the list again; submitting it unchanged
+        finishes with every sensor chosen so far, listed or not.
+        """
         errors = {}
+        site_ids = list(self.selected_sites)
+        sensors = await self._discovery.async_discover(site_ids)
+        if not sensors:
+            errors["base"] = "no_sensors_found"
+            return self.async_show_form(step_id="sensors", data_schema=vol.Schema({}), errors=errors)
+
         if user_input is not None:
-            selected_sensors = user_input.get(CONF_SELECTED_SENSORS, [])
-            if selected_sensors:
+            # The list only shows matching sensors; choices outside it stand.
+            self._chosen.difference_update(self._listed)
+            self._chosen.update(user_input.get(CONF_SELECTED_SENSORS, []))
+            select_all = user_input.get(CONF_SELECT_ALL_SITES, [])
+            for site_id in select_all:
+                self._chosen.update(self._discovery.sites.get(site_id, {}))
+
+            sensor_filter = SensorFilter.from_input(user_input)
+            if sensor_filter != self._filter or select_all:
+                self._filter = sensor_filter
+            elif self._chosen:
                 data = {
                     CONF_USERNAME: self.username,
                     CONF_PASSWORD: self.password,
                     CONF_SELECTED_SITES: self.selected_sites,
-                    CONF_SELECTED_SENSORS: selected_sensors,
+                    CONF_SELECTED_SENSORS: [sid for sid in sensors if sid in self._chosen],
                 }
                 return self.async_create_entry(title="Omnisense", data=data)
             else:
                 errors["base"] = "no_sensors_selected"
 
-        # Fetch sensors for the selected sites
-        #sensors = await self.hass.async_add_executor_job(self._fetch_sensors)
-        sensors = await self.omnisense.get_site_sensor_list(list(self.selected_sites.keys()))
-        if not sensors:
-            errors["base"] = "no_sensors_found"
-            return self.async_show_form(step_id="sensors", data_schema=vol.Schema({}), errors=errors)
-
-        # Create sensor options mapping sensor IDs to labels
-        available_sensors = {sid: f"{info.get('description', '<empty>')} (Type: {info.get('sensor_type', '')}, Site: {info.get('site_name', '')})" for sid, info in sensors.items()}
-        # schema = vol.Schema({
-        #     vol.Required("selected_sensors"): cv.multi_select(available_sensors)
-        # })
+        matching = self._filter.apply(self._discovery, site_ids)
+        self._listed = list(matching)[:SENSOR_LIST_LIMIT]
+        sites = [
+            {"value": site_id, "label": name}
+            for site_id, name in self.selected_sites.items() if site_id in self._discovery.sites
+        ]
 
         schema = vol.Schema({
-            vol.Required("selected_sensors"): SelectSelector({
+            vol.Optional(CONF_SITE_FILTER, description={"suggested_value": self._filter.site}): SelectSelector({
+                "options": sites,
+            }),
+            vol.Optional(CONF_TYPE_FILTER, description={"suggested_value": self._filter.sensor_type}): SelectSelector({
+                "options": self._discovery.sensor_types(site_ids),
+            }),
+            vol.Optional(CONF_SEARCH, default=self._filter.text): str,
+            vol.Optional(CONF_SELECTED_SENSORS, default=[sid for sid in self._listed if sid in self._chosen]): SelectSelector({
                 "options": [
-                    {"value": sid, "label": name} for sid, name in available_sensors.items()
+                    {"value": sid, "label": sensor_label(matching[sid])} for sid in self._listed
                 ],
                 "multiple": True,
                 "mode" : "list"
-            })
+            }),
+            vol.Optional(CONF_SELECT_ALL_SITES, default=[]): SelectSelector({
+                "options": sites,
+                "multiple": True,
+            }),
         })
 
-        return self.async_show_form(step_id="sensors", data_schema=schema, errors=errors)
+        return self.async_show_form(
+            step_id="sensors",
+            data_schema=schema,
+            errors=errors,
+            description_placeholders={
+                "listed": str(len(self._listed)),
+                "matching": str(len(matching)),
+                "selected": str(len(self._chosen)),
+            },
+        )
     
     async def async_finish_flow(self, result):
         if self.omnisense:
@@ -131,15 +226,67 @@ class OmnisenseOptionsFlow(config_entries.OptionsFlow):
 
     def __init__(self, config_entry):
         self.config_entry = config_entry
+        self._discovery = None
+
+    async def _async_sensor_options(self):
+        """Sensors of the entry's sites to offer, by label.
+
+        Discovered through the running account, which answers from the
+        pages its coordinators last fetched; sensors chosen earlier stay
+        on offer even if their site can't be reached right now.
+        """
+        sensors = {}
+        account = async_loaded_account(self.hass, self.config_entry)
+        if account is not None:
+            if self._discovery is None:
+                self._discovery = SensorDiscovery(account.async_site_sensors, account.max_parallel)
+            sensors = await self._discovery.async_discover(list(self.config_entry.data[CONF_SELECTED_SITES]))
+        options = {sid: sensor_label(reading) for sid, reading in sensors.items()}
+        current = self.config_entry.options
+        for sid in (
+            *(current.get(CONF_SELECTED_SENSORS) or self.config_entry.data[CONF_SELECTED_SENSORS]),
+            *current.get(CONF_CRITICAL_SENSORS, []),
+            *current.get(CONF_LOW_PRIORITY_SENSORS, []),
+        ):
+            options.setdefault(sid, sid)
+        return options
 
     async def async_step_init(self, user_input=None):
         """Manage the options for the custom component."""
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
+            try:
+                parse_battery_curve(user_input[CONF_BATTERY_CURVE])
+            except ValueError:
+                errors[CONF_BATTERY_CURVE] = "invalid_battery_curve"
+            if user_input[CONF_MIN_POLL_INTERVAL] > user_input[CONF_MAX_POLL_INTERVAL]:
+                errors["base"] = "invalid_poll_interval"
+            elif set(user_input.get(CONF_CRITICAL_SENSORS, [])) & set(user_input.get(CONF_LOW_PRIORITY_SENSORS, [])):
+                errors["base"] = "sensor_in_two_tiers"
+            elif not errors:
+                return self.async_create_entry(title="", data=user_input)
 
+        current = self.config_entry.options
+        sensor_options = await self._async_sensor_options()
         options = {
-            vol.Optional(CONF_SELECTED_SITES, default=self.config_entry.options.get(CONF_SELECTED_SITES, [])): cv.multi_select(self.config_entry.data[CONF_SELECTED_SITES]),
-            vol.Optional(CONF_SELECTED_SENSORS, default=self.config_entry.options.get(CONF_SELECTED_SENSORS, [])): cv.multi_select(self.config_entry.data[CONF_SELECTED_SENSORS]),
+            vol.Optional(CONF_SELECTED_SITES, default=current.get(CONF_SELECTED_SITES) or list(self.config_entry.data[CONF_SELECTED_SITES])): cv.multi_select(self.config_entry.data[CONF_SELECTED_SITES]),
+            vol.Optional(CONF_SELECTED_SENSORS, default=current.get(CONF_SELECTED_SENSORS) or list(self.config_entry.data[CONF_SELECTED_SENSORS])): cv.multi_select(sensor_options),
+            vol.Required(CONF_MIN_POLL_INTERVAL, default=current.get(CONF_MIN_POLL_INTERVAL, DEFAULT_MIN_POLL_INTERVAL)): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Required(CONF_MAX_POLL_INTERVAL, default=current.get(CONF_MAX_POLL_INTERVAL, DEFAULT_MAX_POLL_INTERVAL)): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Required(CONF_MAX_PARALLEL_SITES, default=current.get(CONF_MAX_PARALLEL_SITES, DEFAULT_MAX_PARALLEL_SITES)): vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+            vol.Required(CONF_SHARD_SITES, default=current.get(CONF_SHARD_SITES, DEFAULT_SHARD_SITES)): bool,
+            vol.Optional(CONF_CRITICAL_SENSORS, default=current.get(CONF_CRITICAL_SENSORS, [])): cv.multi_select(sensor_options),
+            vol.Required(CONF_CRITICAL_INTERVAL, default=current.get(CONF_CRITICAL_INTERVAL, DEFAULT_CRITICAL_INTERVAL)): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Optional(CONF_LOW_PRIORITY_SENSORS, default=current.get(CONF_LOW_PRIORITY_SENSORS, [])): cv.multi_select(sensor_options),
+            vol.Required(CONF_LOW_PRIORITY_INTERVAL, default=current.get(CONF_LOW_PRIORITY_INTERVAL, DEFAULT_LOW_PRIORITY_INTERVAL)): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Required(CONF_TEMPERATURE_DEADBAND, default=current.get(CONF_TEMPERATURE_DEADBAND, 0)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required(CONF_HUMIDITY_DEADBAND, default=current.get(CONF_HUMIDITY_DEADBAND, 0)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required(CONF_FRESHNESS_WINDOW, default=current.get(CONF_FRESHNESS_WINDOW, DEFAULT_FRESHNESS_WINDOW)): vol.All(vol.Coerce(int), vol.Range(min=0, max=600)),
+            vol.Required(CONF_PARSER, default=current.get(CONF_PARSER, DEFAULT_PARSER)): vol.In(PARSER_BACKENDS),
+            vol.Required(CONF_TEMPERATURE_THRESHOLD, default=current.get(CONF_TEMPERATURE_THRESHOLD, DEFAULT_THRESHOLDS[CONF_TEMPERATURE_THRESHOLD])): vol.Coerce(float),
+            vol.Required(CONF_HUMIDITY_THRESHOLD, default=current.get(CONF_HUMIDITY_THRESHOLD, DEFAULT_THRESHOLDS[CONF_HUMIDITY_THRESHOLD])): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+            vol.Required(CONF_WOOD_MOISTURE_THRESHOLD, default=current.get(CONF_WOOD_MOISTURE_THRESHOLD, DEFAULT_THRESHOLDS[CONF_WOOD_MOISTURE_THRESHOLD])): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+            vol.Required(CONF_BATTERY_CURVE, default=current.get(CONF_BATTERY_CURVE, format_battery_curve(DEFAULT_BATTERY_CURVE))): str,
         }
 
-        return self.async_show_form(step_id="init", data_schema=vol.Schema(options))        
+        return self.async_show_form(step_id="init", data_schema=vol.Schema(options), errors=errors)        
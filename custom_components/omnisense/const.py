@@ -1,3 +1,81 @@
 DOMAIN = "omnisense"
 CONF_SELECTED_SITES = "selected_sites"
-CONF_SELECTED_SENSORS = "selected_sensors"
\ No newline at end of file
+CONF_SELECTED_SENSORS = "selected_sensors"
+
+# Adaptive polling bounds, in seconds (see scheduler.py). The floor is the
+# old fixed interval, so adapting never polls the portal more often than
+# that; sensors that report less often are polled less often.
+CONF_MIN_POLL_INTERVAL = "min_poll_interval"
+CONF_MAX_POLL_INTERVAL = "max_poll_interval"
+DEFAULT_POLL_INTERVAL = 15 * 60
+DEFAULT_MIN_POLL_INTERVAL = 15 * 60
+DEFAULT_MAX_POLL_INTERVAL = 60 * 60
+
+# Per-site fetching: at most this many sites in flight, each with its own
+# timeout (seconds).
+CONF_MAX_PARALLEL_SITES = "max_parallel_sites"
+DEFAULT_MAX_PARALLEL_SITES = 4
+SITE_FETCH_TIMEOUT = 30
+
+# Optional deadbands: a reading that moved by less than this is not
+# written to the state machine. Each option covers the listed fields.
+CONF_TEMPERATURE_DEADBAND = "temperature_deadband"
+CONF_HUMIDITY_DEADBAND = "humidity_deadband"
+DEADBAND_FIELDS = {
+    CONF_TEMPERATURE_DEADBAND: ("temperature", "dew_point"),
+    CONF_HUMIDITY_DEADBAND: ("relative_humidity",),
+}
+
+# Site results younger than this (seconds) are reused instead of fetched
+# again, so bursts of manual/automation refreshes share one request.
+CONF_FRESHNESS_WINDOW = "freshness_window"
+DEFAULT_FRESHNESS_WINDOW = 30
+
+# Trend entities report how long a metric spent above these thresholds
+# over the last day (see history.py).
+CONF_TEMPERATURE_THRESHOLD = "temperature_threshold"
+CONF_HUMIDITY_THRESHOLD = "humidity_threshold"
+CONF_WOOD_MOISTURE_THRESHOLD = "wood_moisture_threshold"
+THRESHOLD_FIELDS = {
+    CONF_TEMPERATURE_THRESHOLD: "temperature",
+    CONF_HUMIDITY_THRESHOLD: "relative_humidity",
+    CONF_WOOD_MOISTURE_THRESHOLD: "wood_pct",
+}
+DEFAULT_THRESHOLDS = {
+    CONF_TEMPERATURE_THRESHOLD: 30,
+    CONF_HUMIDITY_THRESHOLD: 70,
+    CONF_WOOD_MOISTURE_THRESHOLD: 20,
+}
+
+# Battery discharge curve as "volts:percent" points, e.g. "2.8:0, 3.4:100"
+# (see derive.py for the default).
+CONF_BATTERY_CURVE = "battery_curve"
+
+# Sensor page parser backend (see parser.py). BeautifulSoup is the slow,
+# forgiving original; the fast backend falls back to it when needed.
+CONF_PARSER = "parser"
+PARSER_FAST = "fast"
+PARSER_BEAUTIFULSOUP = "beautifulsoup"
+PARSER_BACKENDS = (PARSER_FAST, PARSER_BEAUTIFULSOUP)
+DEFAULT_PARSER = PARSER_FAST
+
+# Split an entry into one coordinator per selected site, each on its own
+# schedule, so sites are fetched and fail independently.
+CONF_SHARD_SITES = "shard_sites"
+DEFAULT_SHARD_SITES = False
+
+# Sensor picker form fields in the config flow (see discovery.py).
+CONF_SITE_FILTER = "site_filter"
+CONF_TYPE_FILTER = "sensor_type_filter"
+CONF_SEARCH = "search"
+CONF_SELECT_ALL_SITES = "select_all_sites"
+
+# Priority tiers (see scheduler.py): critical sensors are polled every
+# CONF_CRITICAL_INTERVAL, low-priority ones every CONF_LOW_PRIORITY_INTERVAL
+# (seconds), the rest on the adaptive schedule.
+CONF_CRITICAL_SENSORS = "critical_sensors"
+CONF_LOW_PRIORITY_SENSORS = "low_priority_sensors"
+CONF_CRITICAL_INTERVAL = "critical_poll_interval"
+CONF_LOW_PRIORITY_INTERVAL = "low_priority_poll_interval"
+DEFAULT_CRITICAL_INTERVAL = 60
+DEFAULT_LOW_PRIORITY_INTERVAL = 2 * 60 * 60
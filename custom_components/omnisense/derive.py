@@ -0,0 +1,155 @@
+"""Derived metrics, computed once per refresh over every changed reading.
+
+The portal reports dew point and absolute humidity for most sensor types
+but not all of them, and nothing like heat index or battery charge. This
+fills those in from temperature, relative humidity and battery voltage,
+as numpy arrays over all readings at once rather than per entity.
+
+Portal values always win: a derived dew point or absolute humidity only
+fills a gap.
+
+numpy is imported on first use, so the config flow, which only needs the
+battery curve helpers, doesn't load it.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import replace
+from typing import TYPE_CHECKING
+
+from .reading import SensorReading
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Magnus formula coefficients (Sonntag 1990), valid -45..60 °C.
+MAGNUS_B = 17.62
+MAGNUS_C = 243.12
+
+# The heat index is only defined from 80 °F up; below that it is left
+# empty rather than reported for freezers and crawlspaces.
+HEAT_INDEX_MIN_TEMPERATURE = 26.7
+
+# Default battery discharge curve, (volts, percent) by rising voltage: the
+# straight line between an empty and a new cell the integration has always
+# used. Any piecewise curve can be configured instead.
+DEFAULT_BATTERY_CURVE = ((2.80, 0.0), (3.40, 100.0))
+
+
+def parse_battery_curve(text: str) -> tuple[tuple[float, float], ...]:
+    """Parse ``"2.8:0, 3.0:40, 3.4:100"`` into ``((2.8, 0.0), ...)``.
+
+    Raises ``ValueError`` unless there are at least two points with
+    strictly rising voltages and percentages between 0 and 100.
+    """
+    points = []
+    for item in text.replace(";", ",").split(","):
+        if not item.strip():
+            continue
+        volts, _, percent = item.partition(":")
+        points.append((float(volts), float(percent)))
+    points.sort()
+    if len(points) < 2:
+        raise ValueError("a battery curve needs at least two points")
+    if any(a[0] == b[0] for a, b in zip(points, points[1:])):
+        raise ValueError("battery curve voltages must be distinct")
+    if any(not 0 <= percent <= 100 for _, percent in points):
+        raise ValueError("battery curve percentages must be between 0 and 100")
+    return tuple(points)
+
+
+def format_battery_curve(curve) -> str:
+    return ", ".join(f"{volts:g}:{percent:g}" for volts, percent in curve)
+
+
+def dew_point(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """Dew point (°C) from temperature (°C) and relative humidity (%)."""
+    import numpy as np
+
+    gamma = np.log(humidity / 100) + MAGNUS_B * temperature / (MAGNUS_C + temperature)
+    return MAGNUS_C * gamma / (MAGNUS_B - gamma)
+
+
+def absolute_humidity(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """Absolute humidity (g/m³) from temperature (°C) and relative humidity (%)."""
+    import numpy as np
+
+    vapour_pressure = 6.112 * np.exp(MAGNUS_B * temperature / (MAGNUS_C + temperature)) * humidity / 100
+    return 216.7 * vapour_pressure / (273.15 + temperature)
+
+
+def heat_index(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """NWS heat index (°C): Steadman's approximation, Rothfusz when hot.
+
+    NaN below ``HEAT_INDEX_MIN_TEMPERATURE``.
+    """
+    import numpy as np
+
+    f = temperature * 9 / 5 + 32
+    simple = 0.5 * (f + 61.0 + (f - 68.0) * 1.2 + humidity * 0.094)
+    rothfusz = (
+        -42.379
+        + 2.04901523 * f
+        + 10.14333127 * humidity
+        - 0.22475541 * f * humidity
+        - 0.00683783 * f * f
+        - 0.05481717 * humidity * humidity
+        + 0.00122874 * f * f * humidity
+        + 0.00085282 * f * humidity * humidity
+        - 0.00000199 * f * f * humidity * humidity
+    )
+    dry = (humidity < 13) & (f >= 80) & (f <= 112)
+    rothfusz -= np.where(dry, (13 - humidity) / 4 * np.sqrt(np.abs(17 - np.abs(f - 95)) / 17), 0)
+    damp = (humidity > 85) & (f >= 80) & (f <= 87)
+    rothfusz += np.where(damp, (humidity - 85) / 10 * (87 - f) / 5, 0)
+    index = np.where((simple + f) / 2 < 80, simple, rothfusz)
+    return np.where(temperature >= HEAT_INDEX_MIN_TEMPERATURE, (index - 32) * 5 / 9, np.nan)
+
+
+def battery_level(voltage: np.ndarray, curve) -> np.ndarray:
+    """State of charge (%) along a piecewise-linear discharge curve."""
+    import numpy as np
+
+    volts, percent = zip(*curve)
+    return np.interp(voltage, volts, percent)
+
+
+def _column(readings: list[SensorReading], field: str) -> np.ndarray:
+    import numpy as np
+
+    # None becomes NaN, which every formula above passes straight through.
+    return np.array([getattr(reading, field) for reading in readings], dtype=float)
+
+
+def _value(value: float, digits: int | None):
+    if math.isnan(value):
+        return None
+    return round(value) if digits is None else round(value, digits)
+
+
+def derive_readings(readings: list[SensorReading], battery_curve=DEFAULT_BATTERY_CURVE) -> list[SensorReading]:
+    """Return copies of ``readings`` with the derived fields filled in."""
+    import numpy as np
+
+    if not readings:
+        return []
+    temperature = _column(readings, "temperature")
+    humidity = _column(readings, "relative_humidity")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dew_points = dew_point(temperature, humidity).tolist()
+        absolute = absolute_humidity(temperature, humidity).tolist()
+        heat = heat_index(temperature, humidity).tolist()
+    charge = battery_level(_column(readings, "battery_voltage"), battery_curve).tolist()
+
+    return [
+        replace(
+            reading,
+            dew_point=reading.dew_point if reading.dew_point is not None else _value(dew, 1),
+            absolute_humidity=(
+                reading.absolute_humidity if reading.absolute_humidity is not None else _value(ah, 2)
+            ),
+            heat_index=_value(hi, 1),
+            battery_level=_value(soc, None),
+        )
+        for reading, dew, ah, hi, soc in zip(readings, dew_points, absolute, heat, charge)
+    ]
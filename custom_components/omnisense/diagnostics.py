@@ -0,0 +1,90 @@
+"""Diagnostics support for Omnisense."""
+from __future__ import annotations
+
+from dataclasses import asdict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD}
+
+
+def _seconds(delta):
+    return delta.total_seconds() if delta else None
+
+
+def _coordinator_diagnostics(coordinator) -> dict:
+    scheduler = coordinator.scheduler
+    tiers = coordinator.tiers
+    sites = {reading.site_name for reading in (coordinator.data or {}).values()}
+    return {
+        "last_update_success": coordinator.last_update_success,
+        "update_interval": _seconds(coordinator.update_interval),
+        "next_poll": scheduler.next_poll.isoformat() if scheduler.next_poll else None,
+        "tiers": {
+            tier: {
+                "interval": _seconds(interval),
+                "sensors": len(tiers.members({tier})),
+                "next_poll": tiers.next_poll[tier].isoformat() if tier in tiers.next_poll else None,
+            }
+            for tier, interval in tiers.intervals.items()
+        } if tiers.enabled else None,
+        "sensors": len(coordinator.data or {}),
+        "failed_sites": sorted(coordinator.failed_sites),
+        "suppressed_writes": coordinator.suppressed_writes,
+        "capabilities": {
+            str(sensor_type): sorted(fields)
+            for sensor_type, fields in coordinator.capabilities.items()
+        },
+        "site_intervals": {
+            site: _seconds(scheduler.site_interval(site)) for site in sorted(sites, key=str)
+        },
+    }
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return diagnostics for a config entry."""
+    diagnostics = {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+    }
+
+    hub = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if hub is None:
+        return diagnostics
+
+    account = hub.account
+    diagnostics["hub"] = {
+        "sharded": hub.sharded,
+        "last_update_success": hub.last_update_success,
+        "sensors": len(hub.data),
+        "suppressed_writes": hub.suppressed_writes,
+    }
+    if hub.sharded:
+        diagnostics["shards"] = {
+            str(site_id): _coordinator_diagnostics(coordinator)
+            for site_id, coordinator in hub.coordinators.items()
+        }
+    else:
+        diagnostics["coordinator"] = _coordinator_diagnostics(hub.coordinators[None])
+    diagnostics["refresh_stats"] = hub.refresh_stats.as_dict()
+    diagnostics["account"] = {
+        "entries": len(account.entries),
+        "logged_in": account.logged_in,
+        "login_count": account.client.login_count,
+        "max_parallel_sites": account.max_parallel,
+        "parser": account.client.parser,
+        "coalesced_requests": account.coalesced_requests,
+        "breaker": account.breaker.as_dict(),
+        "site_timings": {
+            site_id: {k: v for k, v in asdict(timing).items() if k != "fetched_at"}
+            for site_id, timing in account.site_timings.items()
+        },
+    }
+    return diagnostics
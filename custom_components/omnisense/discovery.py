@@ -0,0 +1,108 @@
+"""Sensor discovery for the config and options flows.
+
+Listing an account's sensors means fetching the page of every selected
+site. Pages are fetched once per flow, all sites at once, and kept for
+every later render of the form, so a validation error or a changed filter
+costs no portal round-trip. The picker only lists sensors matching the
+current filter, at most ``SENSOR_LIST_LIMIT`` of them, so a large account
+doesn't produce a huge form.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from .const import (
+    CONF_SEARCH,
+    CONF_SITE_FILTER,
+    CONF_TYPE_FILTER,
+    DEFAULT_MAX_PARALLEL_SITES,
+)
+from .reading import SensorReading
+
+_LOGGER = logging.getLogger(__name__)
+
+# Sensors listed in the picker at once; narrow the filter to see others.
+SENSOR_LIST_LIMIT = 200
+
+
+def sensor_label(reading: SensorReading) -> str:
+    return f"{reading.description or '<empty>'} (Type: {reading.sensor_type or ''}, Site: {reading.site_name or ''})"
+
+
+class SensorDiscovery:
+    """Sensors found per site, each site fetched at most once.
+
+    ``fetch_site`` is ``async (site_id) -> {sid: SensorReading}``. A site
+    that fails is left out and tried again on the next call.
+    """
+
+    def __init__(self, fetch_site, parallel: int = DEFAULT_MAX_PARALLEL_SITES):
+        self._fetch_site = fetch_site
+        self._semaphore = asyncio.Semaphore(parallel)
+        self.sites: dict[str, dict[str, SensorReading]] = {}
+
+    async def _async_fetch(self, site_id):
+        async with self._semaphore:
+            return await self._fetch_site(site_id)
+
+    async def async_discover(self, site_ids) -> dict[str, SensorReading]:
+        """Return every sensor of ``site_ids``, fetching sites not seen yet."""
+        missing = [site_id for site_id in site_ids if site_id not in self.sites]
+        if missing:
+            results = await asyncio.gather(
+                *(self._async_fetch(site_id) for site_id in missing), return_exceptions=True
+            )
+            for site_id, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    _LOGGER.warning("Could not list the sensors of site %s: %s", site_id, result)
+                    continue
+                self.sites[site_id] = result
+        return {
+            sid: reading
+            for site_id in site_ids
+            for sid, reading in self.sites.get(site_id, {}).items()
+        }
+
+    def sensor_types(self, site_ids) -> list[str]:
+        return sorted({
+            reading.sensor_type
+            for site_id in site_ids
+            for reading in self.sites.get(site_id, {}).values()
+            if reading.sensor_type
+        })
+
+
+@dataclass(frozen=True)
+class SensorFilter:
+    """What the sensor picker currently lists."""
+
+    site: str | None = None
+    sensor_type: str | None = None
+    text: str = ""
+
+    @classmethod
+    def from_input(cls, user_input: dict) -> SensorFilter:
+        return cls(
+            site=user_input.get(CONF_SITE_FILTER) or None,
+            sensor_type=user_input.get(CONF_TYPE_FILTER) or None,
+            text=(user_input.get(CONF_SEARCH) or "").strip(),
+        )
+
+    def apply(self, discovery: SensorDiscovery, site_ids) -> dict[str, SensorReading]:
+        """Sensors of ``site_ids`` matching the filter, in site order."""
+        needle = self.text.casefold()
+        matching = {}
+        for site_id in site_ids:
+            if self.site is not None and site_id != self.site:
+                continue
+            for sid, reading in discovery.sites.get(site_id, {}).items():
+                if self.sensor_type is not None and reading.sensor_type != self.sensor_type:
+                    continue
+                if needle and needle not in (
+                    f"{sid} {reading.description or ''} {reading.sensor_type or ''} {reading.site_name or ''}"
+                ).casefold():
+                    continue
+                matching[sid] = reading
+        return matching
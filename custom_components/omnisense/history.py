@@ -0,0 +1,188 @@
+"""Recent reading history per sensor, kept in fixed-size ring buffers.
+
+Lets trend entities (rate of change, rolling min/max/mean, time above a
+threshold) be computed without querying the recorder. Each sensor gets one
+buffer of ``HISTORY_SIZE`` reports, indexed by the report's
+``last_activity``, so a sensor that has not reported again adds nothing
+however often we poll.
+
+numpy is imported on first use, as in ``derive``, so loading the sensor
+platform doesn't load it.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import timedelta
+
+from .reading import SensorReading
+
+# Metrics buffered per sensor, in column order.
+HISTORY_METRICS = ("temperature", "relative_humidity", "wood_pct")
+
+# Reports kept per sensor: a day at the portal's usual 10 minute cadence.
+HISTORY_SIZE = 144
+
+# Rate of change is fitted over this much recent history, rolling
+# statistics cover the longer window.
+RATE_WINDOW = timedelta(hours=1)
+STATS_WINDOW = timedelta(hours=24)
+
+
+@dataclass(slots=True)
+class Trend:
+    """Summary of one metric's recent history."""
+
+    rate_per_hour: float | None
+    minimum: float
+    maximum: float
+    mean: float
+    time_above: timedelta | None
+    samples: int
+
+
+class SensorHistory:
+    """Ring buffer of one sensor's recent reports."""
+
+    __slots__ = ("times", "values", "_next", "count")
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        import numpy as np
+
+        self.times = np.zeros(size)
+        self.values = np.full((size, len(HISTORY_METRICS)), np.nan)
+        self._next = 0
+        self.count = 0
+
+    @property
+    def last_time(self) -> float | None:
+        return self.times[self._next - 1] if self.count else None
+
+    def append(self, timestamp: float, values) -> bool:
+        """Add a report, return False if it is not newer than the last one."""
+        last = self.last_time
+        if last is not None and timestamp <= last:
+            return False
+        self.times[self._next] = timestamp
+        self.values[self._next] = values
+        self._next = (self._next + 1) % len(self.times)
+        self.count = min(self.count + 1, len(self.times))
+        return True
+
+    def _ordered(self):
+        """Indexes of the buffered reports, oldest first."""
+        import numpy as np
+
+        size = len(self.times)
+        return (np.arange(self.count) + self._next - self.count) % size
+
+    def series(self, metric: str, window: timedelta | None = None):
+        """``(times, values)`` of one metric, oldest first, NaNs dropped."""
+        import numpy as np
+
+        order = self._ordered()
+        times = self.times[order]
+        values = self.values[order, HISTORY_METRICS.index(metric)]
+        keep = ~np.isnan(values)
+        if window is not None and self.count:
+            keep &= times >= times[-1] - window.total_seconds()
+        return times[keep], values[keep]
+
+    def trend(self, metric: str, threshold: float | None = None) -> Trend | None:
+        """Trend of one metric over the rate and statistics windows."""
+        import numpy as np
+
+        times, values = self.series(metric, STATS_WINDOW)
+        if not len(values):
+            return None
+
+        rate = None
+        recent = times >= times[-1] - RATE_WINDOW.total_seconds()
+        if recent.sum() >= 2:
+            # Least-squares slope, per hour.
+            t = times[recent] - times[recent].mean()
+            rate = float((t * (values[recent] - values[recent].mean())).sum() / (t * t).sum() * 3600)
+
+        time_above = None
+        if threshold is not None:
+            # Each report holds until the next one.
+            durations = np.diff(times)
+            time_above = timedelta(seconds=float(durations[values[:-1] > threshold].sum()))
+
+        return Trend(
+            rate_per_hour=rate,
+            minimum=float(values.min()),
+            maximum=float(values.max()),
+            mean=float(values.mean()),
+            time_above=time_above,
+            samples=len(values),
+        )
+
+    def as_dict(self) -> dict:
+        """Oldest-first lists for the store, NaN as None."""
+        order = self._ordered()
+        return {
+            # last_activity has whole-second resolution.
+            "t": self.times[order].astype(int).tolist(),
+            **{
+                metric: [None if math.isnan(v) else v for v in self.values[order, column].tolist()]
+                for column, metric in enumerate(HISTORY_METRICS)
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, stored: dict) -> SensorHistory:
+        history = cls()
+        times = stored.get("t") or []
+        columns = [stored.get(metric) or [] for metric in HISTORY_METRICS]
+        for row in range(max(0, len(times) - HISTORY_SIZE), len(times)):
+            history.append(times[row], [
+                math.nan if row >= len(column) or column[row] is None else column[row]
+                for column in columns
+            ])
+        return history
+
+
+class ReadingHistory:
+    """Ring buffers for every sensor of one config entry."""
+
+    def __init__(self):
+        self.sensors: dict[str, SensorHistory] = {}
+
+    def observe(self, data: dict[str, SensorReading]) -> set[str]:
+        """Record readings with a new ``last_activity``; return their sids."""
+        updated = set()
+        for sid, reading in data.items():
+            if reading.last_activity is None:
+                continue
+            history = self.sensors.get(sid)
+            if history is None:
+                history = self.sensors[sid] = SensorHistory()
+            timestamp = reading.last_activity.timestamp()
+            if history.count and timestamp <= history.last_time:
+                continue
+            history.append(timestamp, [
+                math.nan if (value := getattr(reading, metric)) is None else value
+                for metric in HISTORY_METRICS
+            ])
+            updated.add(sid)
+        return updated
+
+    def trend(self, sid: str, metric: str, threshold: float | None = None) -> Trend | None:
+        history = self.sensors.get(sid)
+        return None if history is None else history.trend(metric, threshold)
+
+    def retain(self, sids):
+        """Forget sensors not in ``sids``."""
+        for sid in set(self.sensors) - set(sids):
+            del self.sensors[sid]
+
+    def as_dict(self) -> dict:
+        return {sid: history.as_dict() for sid, history in self.sensors.items()}
+
+    @classmethod
+    def from_dict(cls, stored: dict) -> ReadingHistory:
+        history = cls()
+        for sid, sensor in (stored or {}).items():
+            history.sensors[sid] = SensorHistory.from_dict(sensor)
+        return history
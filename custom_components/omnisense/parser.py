@@ -0,0 +1,245 @@
+"""Parsing of OmniSense sensor pages.
+
+Same scrape pyomnisense does inside ``get_sensor_data``, split out so the
+integration can fetch a page and decide separately whether it needs
+parsing at all. Parsing is pure CPU work on immutable input, so it is
+safe to run in an executor.
+
+Two backends produce identical readings:
+
+``fast``
+    Tokenizes just the sensor tables with compiled regular expressions and
+    never builds a document tree. The default.
+``beautifulsoup``
+    The original BeautifulSoup scrape. Slower, but forgiving of markup the
+    fast backend does not understand, so it doubles as its fallback.
+
+``benchmarks/bench_parser.py`` checks both agree on the saved pages in
+``benchmarks/fixtures`` and measures their throughput.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from datetime import datetime, timezone
+from html import unescape
+
+from .const import DEFAULT_PARSER, PARSER_BEAUTIFULSOUP, PARSER_FAST
+from .reading import SensorReading
+
+_LOGGER = logging.getLogger(__name__)
+
+def _parse_float(value: str | None) -> float | None:
+    """``float`` of a reading cell, or None for an empty or placeholder cell."""
+    if value is None:
+        return None
+    try:
+        return float(value.strip())
+    except (ValueError, AttributeError):
+        return None
+
+
+def _parse_timestamp(value: str | None) -> datetime | None:
+    """Parse the portal's naive ``YY-MM-DD HH:MM:SS`` (UTC) timestamps."""
+    if value is None:
+        return None
+    try:
+        naive = datetime.strptime(value.strip(), "%y-%m-%d %H:%M:%S")
+    except (ValueError, AttributeError):
+        return None
+    return naive.replace(tzinfo=timezone.utc)
+
+
+_TITLE_RE = re.compile(r"Sensors for\s+(.+)")
+_CAPTION_RE = re.compile(r"Sensor Type\s*(\d+)")
+
+
+def _reading(cells: list[str], sensor_type: str | None, site_name: str | None, parse_timestamp) -> SensorReading:
+    desc = cells[1]
+    if desc == "~click to edit~":
+        desc = "<description not set>"
+    return SensorReading(
+        sensor_id=cells[0],
+        description=desc,
+        sensor_type=sensor_type,
+        site_name=site_name,
+        last_activity=parse_timestamp(cells[2]),
+        status=cells[3],
+        temperature=_parse_float(cells[4]),
+        relative_humidity=_parse_float(cells[5]),
+        absolute_humidity=_parse_float(cells[6]),
+        dew_point=_parse_float(cells[7]),
+        wood_pct=_parse_float(cells[8]),
+        battery_voltage=_parse_float(cells[9]),
+    )
+
+
+_TIMESTAMP_RE = re.compile(r"(\d\d)-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)")
+
+
+def _timestamp(value: str) -> datetime | None:
+    """``_parse_timestamp`` without ``strptime`` for the usual format."""
+    match = _TIMESTAMP_RE.fullmatch(value)
+    if match is None:
+        return _parse_timestamp(value)
+    year, month, day, hour, minute, second = map(int, match.groups())
+    try:
+        # strptime's %y pivot: 69-99 are 19xx, 00-68 are 20xx.
+        return datetime(year + (1900 if year >= 69 else 2000), month, day, hour, minute, second, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def parse_sensor_page_beautifulsoup(body: bytes, encoding: str = "utf-8") -> dict[str, SensorReading]:
+    """BeautifulSoup backend, see ``parse_sensor_page``."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body.decode(encoding, errors="replace"), "html.parser")
+
+    site_name = None
+    title = soup.find("title")
+    if title and title.get_text():
+        match = _TITLE_RE.search(title.get_text().strip())
+        if match:
+            site_name = match.group(1)
+
+    sensors = {}
+    for table in soup.select("table.sortable.table"):
+        sensor_type = None
+        table_id = table.get("id", "")
+        if table_id.startswith("sensorType"):
+            sensor_type = f"S-{table_id[len('sensorType'):]}"
+        if not sensor_type:
+            caption = table.find("caption")
+            if caption and caption.text:
+                match = _CAPTION_RE.search(caption.text)
+                if match:
+                    sensor_type = f"S-{match.group(1)}"
+
+        for row in table.select("tr.sensorTable"):
+            tds = row.find_all("td")
+            if len(tds) < 10:
+                continue
+            reading = _reading([td.get_text(strip=True) for td in tds], sensor_type, site_name, _parse_timestamp)
+            sensors[reading.sensor_id] = reading
+    return sensors
+
+
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+_TITLE_TAG_RE = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.S | re.I)
+_TABLE_START_RE = re.compile(r"<table\b", re.I)
+_TABLE_RE = re.compile(r"<table\b([^>]*)>(.*?)</table\s*>", re.S | re.I)
+_CAPTION_TAG_RE = re.compile(r"<caption\b[^>]*>(.*?)</caption\s*>", re.S | re.I)
+_ROW_START_RE = re.compile(r"<tr\b", re.I)
+_ROW_RE = re.compile(r"<tr\b([^>]*)>(.*?)</tr\s*>", re.S | re.I)
+_CELL_START_RE = re.compile(r"<td\b", re.I)
+_CELL_RE = re.compile(r"<td\b[^>]*>(.*?)</td\s*>", re.S | re.I)
+_ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def _attrs(raw: str) -> dict[str, str]:
+    attrs = {}
+    for match in _ATTR_RE.finditer(raw):
+        name = match.group(1).lower()
+        if name not in attrs:
+            value = next((group for group in match.groups()[1:] if group is not None), "")
+            attrs[name] = unescape(value)
+    return attrs
+
+
+def _classes(attrs: dict[str, str]) -> set[str]:
+    return set(attrs.get("class", "").split())
+
+
+def _text(fragment: str, strip: bool = True) -> str:
+    """``get_text`` for a markup fragment: every text node, optionally stripped."""
+    if "<" not in fragment:
+        text = unescape(fragment) if "&" in fragment else fragment
+        return text.strip() if strip else text
+    parts = (unescape(part) for part in _TAG_RE.split(fragment))
+    if strip:
+        return "".join(part.strip() for part in parts)
+    return "".join(parts)
+
+
+def parse_sensor_page_fast(body: bytes, encoding: str = "utf-8") -> dict[str, SensorReading]:
+    """Regex tokenizer backend, see ``parse_sensor_page``.
+
+    Only well-formed tables are understood: every table, row and cell
+    closed, none nested. For anything else it raises ``ValueError`` rather
+    than guess how BeautifulSoup would have built the tree, so the caller
+    can fall back.
+    """
+    html = body.decode(encoding, errors="replace")
+    if "<!--" in html:
+        html = _COMMENT_RE.sub("", html)
+
+    site_name = None
+    title = _TITLE_TAG_RE.search(html)
+    if title:
+        text = _text(title.group(1), strip=False).strip()
+        if text:
+            match = _TITLE_RE.search(text)
+            if match:
+                site_name = match.group(1)
+
+    tables = _TABLE_RE.findall(html)
+    if len(tables) != len(_TABLE_START_RE.findall(html)):
+        raise ValueError("unclosed or nested table")
+
+    sensors = {}
+    for table_attrs, content in tables:
+        attrs = _attrs(table_attrs)
+        if not {"sortable", "table"} <= _classes(attrs):
+            continue
+
+        sensor_type = None
+        table_id = attrs.get("id", "")
+        if table_id.startswith("sensorType"):
+            sensor_type = f"S-{table_id[len('sensorType'):]}"
+        if not sensor_type:
+            caption = _CAPTION_TAG_RE.search(content)
+            if caption:
+                match = _CAPTION_RE.search(_text(caption.group(1), strip=False))
+                if match:
+                    sensor_type = f"S-{match.group(1)}"
+
+        rows = _ROW_RE.findall(content)
+        if len(rows) != len(_ROW_START_RE.findall(content)):
+            raise ValueError("unclosed or nested table row")
+        for row_attrs, row in rows:
+            if "sensorTable" not in row_attrs or "sensorTable" not in _classes(_attrs(row_attrs)):
+                continue
+            cells = _CELL_RE.findall(row)
+            if len(cells) != len(_CELL_START_RE.findall(row)):
+                raise ValueError("unclosed or nested table cell")
+            cells = [_text(cell) for cell in cells]
+            if len(cells) < 10:
+                continue
+            reading = _reading(cells, sensor_type, site_name, _timestamp)
+            sensors[reading.sensor_id] = reading
+    return sensors
+
+
+PARSERS = {
+    PARSER_FAST: parse_sensor_page_fast,
+    PARSER_BEAUTIFULSOUP: parse_sensor_page_beautifulsoup,
+}
+
+
+def parse_sensor_page(body: bytes, encoding: str = "utf-8", parser: str = DEFAULT_PARSER) -> dict[str, SensorReading]:
+    """Return ``{sensor_id: SensorReading}`` for one site's raw sensor page.
+
+    Readings carry the fields pyomnisense's ``get_sensor_data`` returns.
+    ``parser`` picks the backend; a page the fast one cannot read is
+    parsed again with BeautifulSoup.
+    """
+    backend = PARSERS.get(parser, parse_sensor_page_beautifulsoup)
+    if backend is parse_sensor_page_beautifulsoup:
+        return backend(body, encoding)
+    try:
+        return backend(body, encoding)
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.debug("Fast parser failed (%s), falling back to BeautifulSoup", err)
+        return parse_sensor_page_beautifulsoup(body, encoding)
@@ -0,0 +1,85 @@
+"""Typed record for one sensor's reading."""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, ClassVar
+
+# Measurement fields, all floats in the portal's units (°C, % RH, g/m³,
+# % wood moisture, V).
+NUMERIC_FIELDS = (
+    "temperature",
+    "relative_humidity",
+    "absolute_humidity",
+    "dew_point",
+    "wood_pct",
+    "battery_voltage",
+)
+
+# Filled in by derive.py rather than read off the portal.
+DERIVED_FIELDS = ("heat_index", "battery_level")
+
+
+def _float(value) -> float | None:
+    if value is None or isinstance(value, float):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _datetime(value) -> datetime | None:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class SensorReading:
+    """One sensor as last seen on its site page.
+
+    Replaces the pyomnisense-style dict: one slotted record per sensor,
+    built once per page parse and shared by every entity of the sensor.
+    Missing or unparseable values are ``None``, numbers are ``float``
+    (``battery_level`` is a whole percentage).
+    """
+
+    sensor_id: str
+    description: str | None = None
+    sensor_type: str | None = None
+    site_name: str | None = None
+    last_activity: datetime | None = None
+    status: str | None = None
+    temperature: float | None = None
+    relative_humidity: float | None = None
+    absolute_humidity: float | None = None
+    dew_point: float | None = None
+    wood_pct: float | None = None
+    battery_voltage: float | None = None
+    heat_index: float | None = None
+    battery_level: int | None = None
+
+    FIELDS: ClassVar[tuple[str, ...]]
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any]) -> SensorReading:
+        """Build a record from a pyomnisense/cache-shaped dict, normalizing values."""
+        reading = cls(**{field: raw.get(field) for field in cls.FIELDS})
+        reading.last_activity = _datetime(reading.last_activity)
+        for field in NUMERIC_FIELDS:
+            setattr(reading, field, _float(getattr(reading, field)))
+        return reading
+
+    def as_dict(self) -> dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def reported_fields(self) -> set[str]:
+        """Fields that carry a value."""
+        return {field for field in self.FIELDS if getattr(self, field) is not None}
+
+
+SensorReading.FIELDS = tuple(field.name for field in fields(SensorReading))
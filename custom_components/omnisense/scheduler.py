@@ -0,0 +1,263 @@
+"""Adaptive poll scheduling for the Omnisense coordinator.
+
+OmniSense sensors report on a fixed cadence, which shows up in the
+``last_activity`` timestamps the portal returns. Rather than polling on a
+fixed interval, the scheduler learns each sensor's (and each site's)
+reporting interval and lands each poll just after a batch of expected
+reports: one poll per reporting period collects every sensor's new
+report, however the sensors are staggered within it.
+
+Sensors can also be put in a priority tier (see PollTiers): critical ones
+polled on a short fixed interval, low-priority ones on a long one, the
+rest left to the adaptive schedule.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import statistics
+from collections import deque
+from datetime import datetime, timedelta
+
+_LOGGER = logging.getLogger(__name__)
+
+# Number of observed reporting intervals remembered per sensor.
+CADENCE_HISTORY = 8
+
+# Deltas shorter than this are treated as duplicate reports / clock noise.
+MIN_CADENCE = timedelta(seconds=10)
+
+# When folding deltas back onto a base period, try splitting the shortest
+# delta into up to this many reports, accepting a fractional error of
+# FOLD_TOLERANCE periods per delta.
+MAX_FOLD = 4
+FOLD_TOLERANCE = 0.15
+
+TIER_CRITICAL = "critical"
+TIER_NORMAL = "normal"
+TIER_LOW = "low"
+
+# A tier due this soon is polled along with the one that is due now,
+# rather than waking the coordinator up again moments later.
+TIER_SLACK = timedelta(seconds=5)
+
+
+class ReportCadence:
+    """Learns the reporting interval of one sensor from its last_activity."""
+
+    def __init__(self):
+        self.last_activity: datetime | None = None
+        self._deltas: deque[float] = deque(maxlen=CADENCE_HISTORY)
+        # Estimate only changes when a delta is added; schedule() reads it
+        # for every sensor on every refresh.
+        self._interval: timedelta | None = None
+
+    def observe(self, last_activity: datetime | None) -> bool:
+        """Record a last_activity value, return True if it moved forward."""
+        if last_activity is None:
+            return False
+        if self.last_activity is None:
+            self.last_activity = last_activity
+            return True
+        if last_activity <= self.last_activity:
+            return False
+
+        delta = last_activity - self.last_activity
+        self.last_activity = last_activity
+        if delta >= MIN_CADENCE:
+            self._deltas.append(delta.total_seconds())
+            self._interval = self._estimate()
+        return True
+
+    @property
+    def interval(self) -> timedelta | None:
+        """Estimated reporting interval, or None until one has been seen."""
+        return self._interval
+
+    def _estimate(self) -> timedelta | None:
+        """Estimate the reporting interval from the remembered deltas.
+
+        If we poll slower than the sensor reports, consecutive deltas are
+        multiples of the real interval. The longest period that divides
+        every delta (within tolerance) is taken as the base, and each delta
+        is folded back onto it before taking the median.
+        """
+        if not self._deltas:
+            return None
+        shortest = min(self._deltas)
+        base = shortest
+        for divisor in range(1, MAX_FOLD + 1):
+            candidate = shortest / divisor
+            if all(
+                abs(d / candidate - round(d / candidate)) <= FOLD_TOLERANCE
+                for d in self._deltas
+            ):
+                base = candidate
+                break
+        folded = [d / max(1, round(d / base)) for d in self._deltas]
+        return timedelta(seconds=statistics.median(folded))
+
+    def next_report(self, now: datetime, interval: timedelta | None = None) -> datetime | None:
+        """Return the first expected report strictly after ``now``."""
+        interval = interval or self.interval
+        if self.last_activity is None or not interval:
+            return None
+        elapsed = (now - self.last_activity) / interval
+        return self.last_activity + interval * max(1, math.floor(elapsed) + 1)
+
+
+class AdaptivePollScheduler:
+    """Chooses when the coordinator should next call get_sensor_data."""
+
+    def __init__(
+        self,
+        default_interval: timedelta,
+        min_interval: timedelta,
+        max_interval: timedelta,
+        grace: timedelta = timedelta(seconds=30),
+    ):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.grace = grace
+
+        self._sensors: dict[str, ReportCadence] = {}
+        self._sites: dict[str, str | None] = {}
+        # Per-site medians, rebuilt lazily after each observe().
+        self._site_intervals: dict[str | None, timedelta] | None = None
+        self.next_poll: datetime | None = None
+
+    def observe(self, data: dict) -> None:
+        """Feed a fresh snapshot (sid -> reading) into the cadence model."""
+        for sid, reading in data.items():
+            cadence = self._sensors.setdefault(sid, ReportCadence())
+            cadence.observe(reading.last_activity)
+            self._sites[sid] = reading.site_name
+        self._site_intervals = None
+
+    def sensor_interval(self, sid: str) -> timedelta | None:
+        """Reporting interval learned for a sensor, falling back to its site."""
+        cadence = self._sensors.get(sid)
+        if cadence is not None and cadence.interval is not None:
+            return cadence.interval
+        return self.site_interval(self._sites.get(sid))
+
+    def site_interval(self, site: str | None) -> timedelta | None:
+        """Median reporting interval of the sensors at a site."""
+        if self._site_intervals is None:
+            by_site: dict[str | None, list[float]] = {}
+            for sid, cadence in self._sensors.items():
+                if cadence.interval is not None:
+                    by_site.setdefault(self._sites.get(sid), []).append(
+                        cadence.interval.total_seconds()
+                    )
+            self._site_intervals = {
+                name: timedelta(seconds=statistics.median(intervals))
+                for name, intervals in by_site.items()
+            }
+        return self._site_intervals.get(site)
+
+    def next_report(self, sid: str, now: datetime) -> datetime | None:
+        """Next time the given sensor is expected to report."""
+        cadence = self._sensors.get(sid)
+        if cadence is None:
+            return None
+        return cadence.next_report(now, self.sensor_interval(sid))
+
+    def schedule(self, now: datetime, sids=None) -> timedelta:
+        """Pick the next poll time and return the interval until it.
+
+        Reports expected within one reporting period of the next one are
+        collected by a single poll just after the last of them, rather
+        than a poll per report, which for staggered sensors would mean
+        polling at the floor. With ``sids``, only those sensors' reports
+        are waited for.
+        """
+        expected = []
+        period = None
+        for sid in self._sensors if sids is None else sids:
+            report = self.next_report(sid, now)
+            if report is None:
+                continue
+            expected.append(report)
+            interval = self.sensor_interval(sid)
+            period = interval if period is None else min(period, interval)
+
+        if expected:
+            first = min(expected)
+            interval = max(report for report in expected if report < first + period) + self.grace - now
+        else:
+            interval = self.default_interval
+        interval = min(max(interval, self.min_interval), self.max_interval)
+
+        self.next_poll = now + interval
+        _LOGGER.debug(
+            "Next Omnisense poll at %s (in %ss, %d/%d sensors with known cadence)",
+            self.next_poll, round(interval.total_seconds()), len(expected), len(self._sensors),
+        )
+        return interval
+
+
+class PollTiers:
+    """Per-sensor priority tiers on top of the adaptive schedule.
+
+    Critical and low-priority sensors are polled on fixed intervals of
+    their own. Everything else, including sensors that only just showed
+    up, is the normal tier, which polls whenever the adaptive scheduler
+    says so. A refresh only fetches the sites with a sensor in a tier
+    that is due.
+    """
+
+    def __init__(self):
+        self.intervals: dict[str, timedelta] = {}
+        # sid -> tier, for sensors outside the normal tier.
+        self._tiers: dict[str, str] = {}
+        # tier -> when it is next due, for the fixed-interval tiers.
+        self.next_poll: dict[str, datetime] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._tiers)
+
+    def configure(self, critical, low, critical_interval: timedelta, low_interval: timedelta) -> None:
+        """Assign sensors to tiers; a sensor listed in both is critical."""
+        tiers = {sid: TIER_LOW for sid in low}
+        tiers.update({sid: TIER_CRITICAL for sid in critical})
+        intervals = {TIER_CRITICAL: critical_interval, TIER_LOW: low_interval}
+        if tiers != self._tiers or intervals != self.intervals:
+            # Changed tiers start over with a poll of everything.
+            self.next_poll = {}
+        self._tiers = tiers
+        self.intervals = intervals
+
+    def tier(self, sid: str) -> str:
+        return self._tiers.get(sid, TIER_NORMAL)
+
+    def members(self, tiers) -> set[str]:
+        """Sensors of the given fixed-interval tiers."""
+        return {sid for sid, tier in self._tiers.items() if tier in tiers}
+
+    def _schedule(self, normal_poll: datetime | None) -> dict[str, datetime | None]:
+        schedule = {TIER_NORMAL: normal_poll}
+        for tier in set(self._tiers.values()):
+            schedule[tier] = self.next_poll.get(tier)
+        return schedule
+
+    def due(self, now: datetime, normal_poll: datetime | None) -> set[str]:
+        """Tiers to poll now, given when the normal tier is next due.
+
+        A refresh that finds nothing due was asked for by hand (or by an
+        automation) and covers every tier.
+        """
+        schedule = self._schedule(normal_poll)
+        due = {tier for tier, when in schedule.items() if when is None or when - TIER_SLACK <= now}
+        return due or set(schedule)
+
+    def polled(self, tiers, now: datetime) -> None:
+        for tier in tiers:
+            if tier in self.intervals:
+                self.next_poll[tier] = now + self.intervals[tier]
+
+    def next_due(self, normal_poll: datetime | None) -> datetime | None:
+        """When the next tier is due."""
+        return min((when for when in self._schedule(normal_poll).values() if when is not None), default=None)
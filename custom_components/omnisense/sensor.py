@@ -1,88 +1,557 @@
-import os
 import logging
-import requests
-import async_timeout
-from datetime import timedelta, datetime
-import aiohttp
+from dataclasses import dataclass
+from datetime import timedelta
 import asyncio
-from bs4 import BeautifulSoup
-import voluptuous as vol
-from homeassistant.components.sensor import PLATFORM_SCHEMA, SensorEntity, SensorDeviceClass
-import homeassistant.helpers.config_validation as cv
+from time import perf_counter
+from typing import Any, Callable
+
+import aiohttp
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator, UpdateFailed
 from homeassistant.core import callback
-from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
-from .const import CONF_SELECTED_SITES, CONF_SELECTED_SENSORS
-
-from pyomnisense import Omnisense, OmnisenseAuthError, OmnisenseError
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.const import CONF_USERNAME, CONF_PASSWORD, UnitOfTime
+from homeassistant.util import dt as dt_util
+from .const import (
+    CONF_SELECTED_SITES,
+    CONF_SELECTED_SENSORS,
+    CONF_MIN_POLL_INTERVAL,
+    CONF_MAX_POLL_INTERVAL,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_MIN_POLL_INTERVAL,
+    DEFAULT_MAX_POLL_INTERVAL,
+    CONF_MAX_PARALLEL_SITES,
+    DEFAULT_MAX_PARALLEL_SITES,
+    DEADBAND_FIELDS,
+    CONF_FRESHNESS_WINDOW,
+    DEFAULT_FRESHNESS_WINDOW,
+    CONF_PARSER,
+    DEFAULT_PARSER,
+    CONF_BATTERY_CURVE,
+    THRESHOLD_FIELDS,
+    DEFAULT_THRESHOLDS,
+    CONF_SHARD_SITES,
+    DEFAULT_SHARD_SITES,
+    CONF_CRITICAL_SENSORS,
+    CONF_LOW_PRIORITY_SENSORS,
+    CONF_CRITICAL_INTERVAL,
+    CONF_LOW_PRIORITY_INTERVAL,
+    DEFAULT_CRITICAL_INTERVAL,
+    DEFAULT_LOW_PRIORITY_INTERVAL,
+)
+from .scheduler import TIER_NORMAL, AdaptivePollScheduler, PollTiers
+from .store import SensorCache
+from .account import PortalUnavailable, SiteFetchError, async_get_account
+from .breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+from .stats import RefreshStats, RefreshStatsGroup
+from .reading import SensorReading
+from .derive import DEFAULT_BATTERY_CURVE, derive_readings, parse_battery_curve
+from .history import ReadingHistory
 
 from .const import DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
 
+# Shortest wait before a refresh held back by the portal breaker retries.
+BREAKER_MIN_RETRY = timedelta(seconds=1)
+
 async def async_setup_entry(hass, entry, async_add_entities):
     """Set up Omnisense sensor(s) from a config entry using DataUpdateCoordinator."""
 
-    coordinator = OmniSenseCoordinator(hass, entry.data)
-    await coordinator._async_setup()  # Ensure login/setup is done before first refresh
+    hub = OmnisenseHub(hass, entry)
 
-    # Store the coordinator keyed by entry_id so multiple config entries
-    # can coexist and async_unload_entry can find it.
+    # Store the hub keyed by entry_id so multiple config entries can
+    # coexist and async_unload_entry can find it.
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = coordinator
+    hass.data[DOMAIN][entry.entry_id] = hub
 
-    await coordinator.async_config_entry_first_refresh()
+    await hub.async_setup()
 
-    entities = []
+    # Portal status, and pipeline timings (disabled by default).
+    async_add_entities([
+        PortalStatusSensor(hub, entry),
+        *(
+            RefreshLatencySensor(hub, entry, statistic)
+            for statistic in RefreshLatencySensor.STATISTICS
+        ),
+    ])
 
-    for idx, sid in enumerate(coordinator.data):
-        entities.append(TemperatureSensor(coordinator, sid))
-        entities.append(SensorBatteryLevel(coordinator, sid))
-        entities.append(SensorLastActivity(coordinator, sid))
-        entities.append(SensorRelativeHumidity(coordinator, sid))
-        entities.append(SensorAbsoluteHumidity(coordinator, sid))
-        entities.append(SensorWoodMoisture(coordinator, sid))
-        entities.append(SensorDewPoint(coordinator, sid))
-        entities.append(SensorBatteryVoltage(coordinator, sid))
-        
-    async_add_entities(entities)
+    # Each sensor's entities belong to the coordinator of its site.
+    for coordinator in hub.coordinators.values():
+        _async_track_entities(hass, entry, coordinator, async_add_entities)
 
     return True
 
+@callback
+def _async_track_entities(hass, entry, coordinator, async_add_entities):
+    """Add entities for a coordinator's sensors, now and as they show up.
+
+    Only metrics a sensor actually reports get an entity; the rest are
+    added later if their field starts showing up.
+    """
+    # Keyed by (sid, description key).
+    created = set()
+    # Name, type and device info of each sensor, shared by its entities.
+    infos = {}
+
+    @callback
+    def _async_add_supported_entities():
+        _async_retire_deselected(hass, entry, coordinator, created)
+        for sid in set(infos) - set(coordinator.data or {}):
+            del infos[sid]
+
+        entities = []
+        for sid, reading in (coordinator.data or {}).items():
+            supported = coordinator.supported_fields(sid)
+            reported = reading.reported_fields()
+            for entity_class, description in ENTITY_DESCRIPTIONS:
+                if (sid, description.key) in created:
+                    continue
+                fields = reported if description.per_sensor else supported
+                if description.always_create or (description.source or description.field) in fields:
+                    info = infos.get(sid)
+                    if info is None:
+                        info = infos[sid] = _sensor_info(sid, reading)
+                    created.add((sid, description.key))
+                    entities.append(entity_class(coordinator, sid, info, description))
+        if entities:
+            _LOGGER.debug("Adding %d Omnisense entities", len(entities))
+            async_add_entities(entities)
+
+    _async_add_supported_entities()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_supported_entities))
+
+def _selection(entry):
+    """Return the ``(sites, sensor_ids)`` selected for an entry.
+
+    The options flow can narrow the sites and sensors picked during setup;
+    an empty selection there means "keep what setup chose".
+    """
+    sites = entry.data.get(CONF_SELECTED_SITES, [])
+    chosen_sites = entry.options.get(CONF_SELECTED_SITES)
+    if chosen_sites:
+        names = sites if isinstance(sites, dict) else {}
+        sites = {site_id: names.get(site_id, site_id) for site_id in chosen_sites}
+
+    sensor_ids = entry.options.get(CONF_SELECTED_SENSORS) or entry.data.get(CONF_SELECTED_SENSORS, [])
+    return sites, list(sensor_ids)
+
+
+def _shards(entry):
+    """Site ids to give a coordinator of their own, or ``[None]`` for one
+    coordinator covering every selected site."""
+    sites, _ = _selection(entry)
+    if not entry.options.get(CONF_SHARD_SITES, DEFAULT_SHARD_SITES) or not sites:
+        return [None]
+    return list(sites)
+
+
+@callback
+def _async_retire_deselected(hass, entry, coordinator, created):
+    """Remove devices (and with them entities) of deselected sensors.
+
+    Sensors that merely stopped showing up on the portal keep their
+    entities, which report unavailable until the sensor comes back.
+    """
+    data = coordinator.data or {}
+    retired = {
+        sid for sid, _ in created
+        if sid not in data and not coordinator.is_selected(sid)
+    }
+    if not retired:
+        return
+
+    device_registry = dr.async_get(hass)
+    for sid in retired:
+        device = device_registry.async_get_device(identifiers={(DOMAIN, sid)})
+        if device is not None:
+            device_registry.async_update_device(device.id, remove_config_entry_id=entry.entry_id)
+    created.difference_update({key for key in created if key[0] in retired})
+    _LOGGER.debug("Retired %d deselected Omnisense sensors", len(retired))
+
+
+async def _site_result(site_id, future):
+    # Shielded: the future may be shared with another entry's refresh.
+    return site_id, await asyncio.shield(future)
+
+
 class OmniSenseCoordinator(DataUpdateCoordinator):
-    """custom coordinator."""
+    """custom coordinator.
+
+    Covers every selected site of an entry, or with ``site_id`` just that
+    one site (see OmnisenseHub).
+    """
 
-    def __init__(self, hass, data):
+    def __init__(self, hass, entry, site_id=None):
         """Initialize my coordinator."""
+        data = entry.data
+        self.site_id = site_id
+        # Added once to the first interval the scheduler picks, so the
+        # shards of an entry don't all poll at the same instant.
+        self.stagger = timedelta(0)
+
+        # The interval is re-chosen after every refresh by the adaptive
+        # scheduler; this is only the starting point.
+        self.scheduler = AdaptivePollScheduler(
+            default_interval=timedelta(seconds=DEFAULT_POLL_INTERVAL),
+            min_interval=timedelta(seconds=DEFAULT_MIN_POLL_INTERVAL),
+            max_interval=timedelta(seconds=DEFAULT_MAX_POLL_INTERVAL),
+        )
+        self.tiers = PollTiers()
+
         super().__init__(
             hass,
             _LOGGER,
-            name=DOMAIN,
-            update_interval=timedelta(minutes=15),
+            name=DOMAIN if site_id is None else f"{DOMAIN} site {site_id}",
+            update_interval=min(self.scheduler.default_interval, self.scheduler.max_interval),
             update_method=self._omnisense_async_update_data,
         )
 
         self.username = data.get(CONF_USERNAME)
         self.password = data.get(CONF_PASSWORD)
-        self.sites = data.get(CONF_SELECTED_SITES, [])
-        self.sensor_ids = data.get(CONF_SELECTED_SENSORS, [])
 
-        self.omnisense = Omnisense()
+        # Client, session and fetch batching are shared with every other
+        # entry for the same account.
+        self.account = async_get_account(hass, entry)
+        self._cache = SensorCache(hass, entry.entry_id, site_id)
+
+        # site_id -> sensor ids last seen there, so a failed site can keep
+        # its last-known readings.
+        self._site_sensors = {}
+        # sid -> site it was last seen on. Unlike _site_sensors this keeps
+        # sensors that dropped off their page, so they aren't mistaken for
+        # deselected ones.
+        self._sensor_sites = {}
+        self.failed_sites = set()
+        # site_id -> readings dict last merged for it. The client hands back
+        # the very same dict for an unchanged page, so an identity check
+        # tells whether anything at all changed since the last refresh.
+        self._site_pages = {}
+        self._snapshot_unchanged = False
+        # sensor_type -> fields seen with a value on sensors of that type.
+        self.capabilities = {}
+        # sid -> (reading as merged, reading with derived metrics), so only
+        # readings that changed get derived again.
+        self._derived = {}
+        # Recent reports per sensor, for the trend entities.
+        self.history = ReadingHistory()
+
+        # Change-suppressed fan-out: listeners indexed by sid, the values
+        # each sensor was last notified with, and optional per-field
+        # deadbands below which a change is not worth a state write.
+        # Readings are only replaced when their page changed, so the last
+        # reading object diffed per sid lets unchanged ones skip the diff.
+        self._listener_index = {}
+        self._notified = {}
+        self._diffed = {}
+        self._notified_success = True
+        self.suppressed_writes = 0
+
+        # Per-refresh pipeline timings. A successful refresh is recorded once
+        # its listeners have been notified, so _timing carries it from the
+        # update method to async_update_listeners.
+        self.refresh_stats = RefreshStats(hass.loop)
+        self._timing = None
+
+        self._load_options(entry)
+        self.update_interval = min(self.scheduler.default_interval, self.scheduler.max_interval)
+
+    def _load_options(self, entry):
+        """Read the site/sensor selection and tuning knobs from the entry."""
+        options = entry.options
+        self.sites, self.sensor_ids = _selection(entry)
+        if self.site_id is not None:
+            names = self.sites if isinstance(self.sites, dict) else {}
+            self.sites = {self.site_id: names.get(self.site_id, self.site_id)}
+
+        min_interval = timedelta(seconds=options.get(CONF_MIN_POLL_INTERVAL, DEFAULT_MIN_POLL_INTERVAL))
+        max_interval = timedelta(seconds=options.get(CONF_MAX_POLL_INTERVAL, DEFAULT_MAX_POLL_INTERVAL))
+        self.scheduler.min_interval = min_interval
+        self.scheduler.max_interval = max(max_interval, min_interval)
+        self.tiers.configure(
+            options.get(CONF_CRITICAL_SENSORS, []),
+            options.get(CONF_LOW_PRIORITY_SENSORS, []),
+            timedelta(seconds=options.get(CONF_CRITICAL_INTERVAL, DEFAULT_CRITICAL_INTERVAL)),
+            timedelta(seconds=options.get(CONF_LOW_PRIORITY_INTERVAL, DEFAULT_LOW_PRIORITY_INTERVAL)),
+        )
+
+        self.freshness_window = options.get(CONF_FRESHNESS_WINDOW, DEFAULT_FRESHNESS_WINDOW)
+        self.account.set_max_parallel(options.get(CONF_MAX_PARALLEL_SITES, DEFAULT_MAX_PARALLEL_SITES))
+        self.account.set_parser(options.get(CONF_PARSER, DEFAULT_PARSER))
+        self.deadbands = {
+            field: options.get(option, 0)
+            for option, fields in DEADBAND_FIELDS.items()
+            for field in fields
+        }
+        self.thresholds = {
+            field: options.get(option, DEFAULT_THRESHOLDS[option])
+            for option, field in THRESHOLD_FIELDS.items()
+        }
+        self.battery_curve = DEFAULT_BATTERY_CURVE
+        if options.get(CONF_BATTERY_CURVE):
+            try:
+                self.battery_curve = parse_battery_curve(options[CONF_BATTERY_CURVE])
+            except ValueError as err:
+                _LOGGER.warning("Ignoring invalid Omnisense battery curve: %s", err)
+
+    @callback
+    def async_apply_options(self, entry):
+        """Apply changed options in place, without reloading the entry.
+
+        Sensors that are no longer selected are dropped from the snapshot
+        straight away so their entities get retired; newly selected ones
+        show up with the next refresh.
+        """
+        self._load_options(entry)
+        # The selection (or the deadbands) may have changed even where the
+        # pages haven't.
+        self._site_pages = {}
+        self._diffed = {}
+        self._derived = {}
+        self._site_sensors = {
+            site_id: sids for site_id, sids in self._site_sensors.items()
+            if site_id in self.sites
+        }
+        if self.data is not None:
+            # Re-derived too, in case the battery curve changed.
+            self.data = self._derive({sid: r for sid, r in self.data.items() if self.is_selected(sid)})
+            self.history.retain(self.data)
+            # Rewrite every entity: attributes such as the poll tier
+            # depend on the options, not on the readings.
+            self._notified = {}
+            self.async_update_listeners()
+
+    def is_selected(self, sid):
+        """Whether the sensor is part of this entry's current selection.
+
+        A selected sensor missing from its site's latest page still is.
+        """
+        if self.sensor_ids and sid not in self.sensor_ids:
+            return False
+        site_id = self._sensor_sites.get(sid)
+        return site_id is None or site_id in self.sites
+
+    @property
+    def omnisense(self):
+        return self.account.client
+
+    @property
+    def next_poll(self):
+        """When the adaptive scheduler plans the next refresh (UTC)."""
+        return self.scheduler.next_poll
+
+    @property
+    def next_refresh(self):
+        """When the next refresh is planned (UTC), whichever tier it is for."""
+        if self.tiers.enabled:
+            return self.tiers.next_due(self.scheduler.next_poll)
+        return self.scheduler.next_poll
+
+    def _due(self):
+        """Tiers due for this refresh, and the sites to fetch for them.
+
+        Without tiers (or with the normal tier due) that is every site;
+        otherwise only the sites known to hold a sensor of a due tier.
+        Returns ``(None, sites)`` when no tiers are configured.
+        """
+        if not self.tiers.enabled:
+            return None, list(self.sites)
+        due = self.tiers.due(dt_util.utcnow(), self.scheduler.next_poll)
+        if TIER_NORMAL in due:
+            return due, list(self.sites)
+        sids = self.tiers.members(due)
+        return due, [
+            site_id for site_id in self.sites
+            if not sids.isdisjoint(self._site_sensors.get(site_id, ()))
+        ]
+
+    @callback
+    def async_add_listener(self, update_callback, context=None):
+        """Listen for data updates, indexed by the sid in ``context``.
+
+        Entities pass ``(sid, field)`` as their context; anything else is
+        treated as a broadcast listener and notified on every update.
+        """
+        remove = super().async_add_listener(update_callback, context)
+        sid = context[0] if isinstance(context, tuple) else None
+        self._listener_index.setdefault(sid, set()).add(remove)
+
+        @callback
+        def remove_listener():
+            listeners = self._listener_index.get(sid)
+            if listeners is not None:
+                listeners.discard(remove)
+                if not listeners:
+                    del self._listener_index[sid]
+            remove()
+
+        return remove_listener
+
+    @callback
+    def async_update_listeners(self):
+        """Notify only the listeners whose sensor field actually changed."""
+        timing, self._timing = self._timing, None
+        started = perf_counter()
+        unchanged, self._snapshot_unchanged = self._snapshot_unchanged, False
+
+        if unchanged and self.last_update_success == self._notified_success:
+            # Same pages as last time: nothing to diff, nobody to notify.
+            self.suppressed_writes += len(self._listeners)
+            if timing is not None:
+                self._record_timing(timing, {}, 0)
+            return
+
+        if self.last_update_success != self._notified_success:
+            # Availability flipped, every entity has to re-render.
+            self._notified_success = self.last_update_success
+            super().async_update_listeners()
+            changed = self._diff_snapshot() if self.last_update_success else {}
+            if timing is not None:
+                timing.add("fanout", started)
+                self._record_timing(timing, changed, len(self._listeners))
+            return
+
+        notify = list(self._listener_index.get(None, ()))
+        changed = self._diff_snapshot()
+        for sid, fields in changed.items():
+            for remove in self._listener_index.get(sid, ()):
+                _, context = self._listeners[remove]
+                if context[1] is None or context[1] in fields:
+                    notify.append(remove)
+        fanout_started = perf_counter()
+
+        self.suppressed_writes += len(self._listeners) - len(notify)
+        _LOGGER.debug(
+            "Notifying %d of %d listeners (%d suppressed so far)",
+            len(notify), len(self._listeners), self.suppressed_writes,
+        )
+        for remove in notify:
+            if remove in self._listeners:
+                self._listeners[remove][0]()
+
+        if timing is not None:
+            timing.phases["diff"] = fanout_started - started
+            timing.add("fanout", fanout_started)
+            self._record_timing(timing, changed, len(notify))
+
+    @callback
+    def _record_timing(self, timing, changed, notified):
+        timing.changed = len(changed)
+        timing.notified = notified
+        self.refresh_stats.record(timing)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "Refresh took %.3fs (%s), %d sensors changed, %d listeners notified, loop blocked %.3fs",
+                timing.total,
+                ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timing.phases.items()),
+                timing.changed,
+                notified,
+                timing.loop_blocked,
+            )
+
+    def _diff_snapshot(self):
+        """Return {sid: changed fields} against the last notified snapshot.
+
+        Values that moved by less than the field's deadband are not treated
+        as changed, and the last notified value is kept so slow drift still
+        accumulates past the deadband eventually.
+        """
+        data = self.data or {}
+        changed = {}
+        for sid in list(self._notified):
+            if sid not in data:
+                changed[sid] = set(self._notified.pop(sid))
+                self._diffed.pop(sid, None)
+
+        for sid, reading in data.items():
+            if self._diffed.get(sid) is reading:
+                continue
+            self._diffed[sid] = reading
+            notified = self._notified.setdefault(sid, {})
+            fields = set()
+            for field in SensorReading.FIELDS:
+                value = getattr(reading, field)
+                if field not in notified or not self._same(field, notified[field], value):
+                    notified[field] = value
+                    fields.add(field)
+            if fields:
+                changed[sid] = fields
+        return changed
+
+    def _same(self, field, old, new):
+        deadband = self.deadbands.get(field)
+        if (
+            deadband
+            and isinstance(old, (int, float))
+            and isinstance(new, (int, float))
+        ):
+            return abs(new - old) < deadband
+        return old == new
+
+    def _derive(self, data):
+        """Return ``data`` with derived metrics, computed for changed readings only."""
+        pending = [
+            (sid, reading) for sid, reading in data.items()
+            if (known := self._derived.get(sid)) is None or (reading is not known[0] and reading is not known[1])
+        ]
+        fresh = {}
+        if pending:
+            readings = derive_readings([reading for _, reading in pending], self.battery_curve)
+            fresh = {sid: (source, reading) for (sid, source), reading in zip(pending, readings)}
+        self._derived = {sid: fresh.get(sid) or self._derived[sid] for sid in data}
+        return {sid: reading for sid, (_, reading) in self._derived.items()}
+
+    def _learn_capabilities(self, data):
+        """Record which fields carry values, per sensor_type."""
+        for reading in data.values():
+            self.capabilities.setdefault(reading.sensor_type, set()).update(reading.reported_fields())
+
+    def supported_fields(self, sid):
+        """Fields the given sensor (or any sensor of its type) has reported."""
+        reading = (self.data or {}).get(sid)
+        if reading is None:
+            return set(self.capabilities.get(None, ()))
+        return reading.reported_fields() | self.capabilities.get(reading.sensor_type, set())
+
+    async def async_restore(self):
+        """Seed data from the persisted catalog, return True if there was one."""
+        snapshot, site_sensors, history = await self._cache.async_load()
+        if self.sensor_ids:
+            snapshot = {sid: r for sid, r in snapshot.items() if sid in self.sensor_ids}
+        if not snapshot:
+            return False
+
+        _LOGGER.debug("Restored %d sensors from the Omnisense cache", len(snapshot))
+        snapshot = self._derive(snapshot)
+        self.data = snapshot
+        self.history = ReadingHistory.from_dict(history)
+        self.history.retain(snapshot)
+        self.history.observe(snapshot)
+        self._site_sensors = site_sensors
+        self._sensor_sites = {sid: site_id for site_id, sids in site_sensors.items() for sid in sids}
+        self.scheduler.observe(snapshot)
+        self._learn_capabilities(snapshot)
+        return True
 
     async def _async_setup(self):
+        from pyomnisense import OmnisenseAuthError, OmnisenseError
 
         try:
-            success = await self.omnisense.login(self.username, self.password)
+            await self.account.async_login()
         except OmnisenseAuthError as err:
             _LOGGER.error("Omnisense login rejected: %s", err)
             raise UpdateFailed("Failed to login to Omnisense with provided credentials")
-        except OmnisenseError as err:
+        except (OmnisenseError, asyncio.TimeoutError, aiohttp.ClientError) as err:
             _LOGGER.error("Omnisense login failed: %s", err)
             raise UpdateFailed(f"Failed to login to Omnisense: {err}")
-
-        if not success:
-            _LOGGER.error("Failed to login to omnisense with provided credentials")
-            raise UpdateFailed("Failed to login to Omnisense with provided credentials")
     #     """Set up the coordinator
 
     #     This is the place to set up your coordinator,
@@ -92,330 +561,663 @@ class OmniSenseCoordinator(DataUpdateCoordinator):
     #     coordinator.async_config_entry_first_refresh.
     #     """
 
+    def _filter_selected(self, site_data):
+        if not self.sensor_ids:
+            return site_data
+        return {sid: r for sid, r in site_data.items() if sid in self.sensor_ids}
+
     async def _omnisense_async_update_data(self):
         """Fetch data from API endpoint.
 
         This is the place to pre-process the data to lookup tables
         so entities can quickly look up their data.
         """
-        # Note: asyncio.TimeoutError and aiohttp.ClientError are already
-        # handled by the data update coordinator.
-        _LOGGER.debug(f"Fetching new sensor data")
-        async with async_timeout.timeout(30):
-            try:
-                data = await self.omnisense.get_sensor_data(self.sites, self.sensor_ids)
-                _LOGGER.debug(f"Fetched sensor data: {data}")
-            except OmnisenseAuthError as err:
-                _LOGGER.error("Omnisense authentication failed during fetch: %s", err)
-                raise UpdateFailed(f"Authentication failed: {err}")
-            except OmnisenseError as err:
-                _LOGGER.error("Error fetching sensor data: %s", err)
-                raise UpdateFailed(f"Error fetching sensor data: {err}")
-
-            return data
-
-
-class SensorBase(CoordinatorEntity, SensorEntity):
-    """Base class for Omnisense entities."""
-
-    should_poll = False
-
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator)
-        self._sid = sid
-
-        # These can be set once, as they are static
-        sid = self._get_sensor_data('sensor_id')
-        if sid != self._sid:
-            _LOGGER.warning(f"Sensor ID mismatch: expected {self._sid}, got {sid}. Using {self._sid} instead.")
-        
-        self._sensor_name = self._get_sensor_data('description')
-        self._sensor_type = self._get_sensor_data('sensor_type')
-
-    def _get_sensor_data(self, field=None, error_value='Unknown'):
-        data = self.coordinator.data.get(self._sid, {})
-        if field is None:
+        timing = self._timing = self.refresh_stats.begin()
+        done = False
+        try:
+            data = await self._async_update_snapshot(timing)
+            done = True
             return data
-        value = data.get(field, error_value)
-        if value is None:
-            return error_value
-        return value
+        finally:
+            if not done:
+                # Listeners may not be notified after a failure, and a
+                # cancelled refresh (an unload during the first refresh)
+                # never gets that far: record it now, which also stops
+                # the loop watchdog.
+                self._timing = None
+                timing.success = False
+                self._back_off()
+                self.refresh_stats.record(timing)
+
+    def _back_off(self):
+        """While the portal breaker is open, come back when it can be probed."""
+        breaker = self.account.breaker
+        if breaker.state != STATE_CLOSED:
+            self.update_interval = max(breaker.retry_in(), BREAKER_MIN_RETRY)
+
+    async def _async_update_snapshot(self, timing):
+        from pyomnisense import OmnisenseAuthError
+
+        due, sites = self._due()
+        if not sites and self.data is not None:
+            # The due tier's sensors aren't on any page fetched so far;
+            # the normal tier will pick them up.
+            self._snapshot_unchanged = timing.unchanged = True
+            self._reschedule(due, self.data)
+            timing.sensors = len(self.data)
+            return self.data
 
-    @property
-    def device_info(self):
-        """Return device information about this sensor."""
-        return {
-            "identifiers": {(DOMAIN, self._sid)},
-            "name": self._sensor_name,
-            "manufacturer": "OmniSense",
-            "model": self._sensor_type,
-            "sw_version": "N/A",
-        }
+        try:
+            await self.account.async_guard(sites)
+        except PortalUnavailable as err:
+            raise UpdateFailed(str(err)) from err
+        if not self.account.logged_in:
+            await self._async_setup()
+        phase = timing.add("login", timing.started)
+
+        _LOGGER.debug("Fetching new sensor data from %d site(s)", len(sites))
+        self._snapshot_unchanged = False
+        previous = self.data or {}
+        data = {}
+        if due is not None and TIER_NORMAL not in due:
+            # Only some sites are fetched; sensors of the others keep their
+            # current reading. Every reading on a fetched page is merged,
+            # whatever its tier, since the page was downloaded anyway.
+            fetched = set().union(*(self._site_sensors.get(site_id, ()) for site_id in sites))
+            data = {sid: r for sid, r in previous.items() if sid not in fetched}
+        failed = set()
+        unchanged_sites = 0
+        auth_error = None
+
+        # One request per site, merged as they complete. A site that fails
+        # keeps serving its last-known readings instead of failing the
+        # whole refresh.
+        futures = self.account.async_request_sites(
+            sites, self.freshness_window, partial=len(sites) < len(self.sites)
+        )
+        tasks = [
+            asyncio.create_task(_site_result(site_id, future))
+            for site_id, future in futures.items()
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    site_id, site_data = await next_done
+                except SiteFetchError as err:
+                    failed.add(err.site_id)
+                    if isinstance(err.__cause__, OmnisenseAuthError):
+                        auth_error = err.__cause__
+                    for sid in self._site_sensors.get(err.site_id, ()):
+                        if sid in previous:
+                            data[sid] = previous[sid]
+                    continue
+
+                self._record_site_timing(timing, site_id)
+                if self._site_pages.get(site_id) is site_data:
+                    unchanged_sites += 1
+                self._site_pages[site_id] = site_data
+
+                site_data = self._filter_selected(site_data)
+                self._site_sensors[site_id] = set(site_data)
+                self._sensor_sites.update(dict.fromkeys(site_data, site_id))
+                data.update(site_data)
+        finally:
+            for task in tasks:
+                task.cancel()
+        phase = timing.add("fetch", phase)
+
+        # Sites a tier-only refresh skipped keep the outcome of their last
+        # fetch; the refresh only fails once every site is failing.
+        self.failed_sites = failed | (self.failed_sites & (set(self.sites) - set(sites)))
+        timing.failed_sites = len(failed)
+        if auth_error is not None and len(failed) == len(tasks):
+            _LOGGER.error("Omnisense authentication failed during fetch: %s", auth_error)
+            # Start over with a full login next time round.
+            await self.account.async_auth_failed()
+        if failed and self.failed_sites >= set(self.sites):
+            if auth_error is not None:
+                raise UpdateFailed(f"Authentication failed: {auth_error}")
+            raise UpdateFailed(f"Error fetching sensor data for all {len(self.failed_sites)} site(s)")
+
+        if self.data is not None and not failed and unchanged_sites == len(tasks):
+            # Every page came back identical: keep the current snapshot (and
+            # everything derived from it) and skip the listener fan-out.
+            _LOGGER.debug("No Omnisense site page changed since the last refresh")
+            self._snapshot_unchanged = timing.unchanged = True
+            self._reschedule(due, self.data)
+            await self.account.async_save_session()
+            timing.sensors = len(self.data)
+            timing.add("merge", phase)
+            return self.data
+
+        _LOGGER.debug(
+            "Fetched %d sensors from %d site(s), %d site(s) kept last-known data",
+            len(data), len(tasks) - len(failed), len(failed),
+        )
 
-class TemperatureSensor(SensorBase):
+        data = self._derive(data)
+        self._learn_capabilities(data)
+        self.history.observe(data)
 
-    device_class = SensorDeviceClass.TEMPERATURE
-    _attr_icon = "mdi:thermometer"
+        self.scheduler.observe(data)
+        self._reschedule(due, data)
 
-    def __init__(self, coordinator=None, sid=None):
-        """Initialize the sensor."""
+        self._cache.async_delay_save(data, self._site_sensors, self.history)
+        await self.account.async_save_session()
 
-        super().__init__(coordinator, sid)
+        timing.sensors = len(data)
+        timing.add("merge", phase)
+        return data
 
-        _LOGGER.debug(f"Initializing temperature entity for sensor: {self._sid}")        
+    def _reschedule(self, due, data):
+        """Re-arm the refresh timer just after the next batch of expected reports.
 
-        self._attr_unique_id = f"{self._sid}_temperature"
-        self._attr_name = f"{self._sensor_name} Temperature"
-        self._value = None
-        self._extract_value()
+        With priority tiers, the normal tier is only rescheduled when it
+        was polled, and the timer is armed for whichever tier is next due.
+        """
+        now = dt_util.utcnow()
+        stagger, self.stagger = self.stagger, timedelta(0)
+        if due is None:
+            self.update_interval = self.scheduler.schedule(now) + stagger
+        else:
+            if TIER_NORMAL in due or self.scheduler.next_poll is None:
+                normal = [sid for sid in data if self.tiers.tier(sid) == TIER_NORMAL]
+                self.scheduler.schedule(now, normal)
+            self.tiers.polled(due, now)
+            self.update_interval = max(self.tiers.next_due(self.scheduler.next_poll) - now, timedelta(0)) + stagger
+        if stagger and self.scheduler.next_poll is not None:
+            self.scheduler.next_poll += stagger
+
+    def _record_site_timing(self, timing, site_id):
+        site_timing = self.account.site_timings.get(site_id)
+        if site_timing is None:
+            return
+        # A result fetched before this refresh started was shared with
+        # another entry or served from the freshness window.
+        shared = site_timing.fetched_at < timing.started
+        timing.sites[site_id] = {
+            "http": site_timing.http,
+            "parse": site_timing.parse,
+            "bytes": site_timing.bytes,
+            "changed": site_timing.changed,
+            "shared": shared,
+        }
+        if not shared:
+            timing.bytes += site_timing.bytes
+
+
+class OmnisenseHub:
+    """The coordinators of one config entry.
+
+    Normally a single coordinator polls every selected site. With the
+    ``shard_sites`` option each site gets a coordinator of its own, with
+    its own adaptive schedule, the first polls staggered across the poll
+    interval. A site that keeps failing then only takes its own sensors
+    offline, and a busy site can poll more often than a quiet one. The
+    hub answers for the entry as a whole: availability, refresh stats,
+    diagnostics and option changes.
+    """
+
+    def __init__(self, hass, entry):
+        self.hass = hass
+        self.entry = entry
+        self.coordinators = {
+            site_id: OmniSenseCoordinator(hass, entry, site_id) for site_id in _shards(entry)
+        }
+        self.refresh_stats = RefreshStatsGroup(
+            [coordinator.refresh_stats for coordinator in self.coordinators.values()]
+        )
 
-    def _extract_value(self):
-        self._value = self._get_sensor_data('temperature', error_value=None)
+        # Spread the shards evenly across the starting interval. What a
+        # sensor type reports is learned across all of them, so the same
+        # entities get created as without sharding.
+        shards = list(self.coordinators.values())
+        capabilities = {}
+        for index, coordinator in enumerate(shards):
+            coordinator.capabilities = capabilities
+            coordinator.stagger = coordinator.update_interval * index / len(shards)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        self._extract_value()
-        _LOGGER.debug(f"Updating sensor: {self._attr_name} = {self.native_value}{self.native_unit_of_measurement}")
-        self.async_write_ha_state()
-   
     @property
-    def native_value(self) -> float:
-        return self._value
+    def sharded(self):
+        return None not in self.coordinators
 
     @property
-    def native_unit_of_measurement(self):
-        return "°C"    
-    
-class SensorBatteryLevel(SensorBase):
-    device_class = SensorDeviceClass.BATTERY
-    _attr_icon = "mdi:battery"
-
-    FULL_VOLTAGE = 3.40  # Voltage of a new battery
-    EMPTY_VOLTAGE = 2.80  # Voltage considered empty
-    STEP_VOLTAGE = 0.03   # Voltage drop per 10% step
-
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator, sid)
-        _LOGGER.debug(f"Initializing battery entity for sensor: {self._sid}")        
-        self._attr_unique_id = f"{self._sid}_battery"
-        self._attr_name = f"{self._sensor_name} Battery Level"
-        self._value = None
-        self._extract_value()
-
-    def _extract_value(self):
-        # pyomnisense >= 0.3.0 returns battery_voltage as Optional[float].
-        self.battery_voltage = self._get_sensor_data(
-            'battery_voltage', error_value=None,
-        )
-        voltage = self.battery_voltage if self.battery_voltage is not None else 0
-        self._value = self._estimate_soc(voltage)
+    def account(self):
+        return next(iter(self.coordinators.values())).account
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        self._extract_value()
-        self.async_write_ha_state()
+    @property
+    def data(self):
+        """Readings of every shard, merged."""
+        data = {}
+        for coordinator in self.coordinators.values():
+            data.update(coordinator.data or {})
+        return data
 
-    def _estimate_soc(self, voltage):
-        if voltage >= self.FULL_VOLTAGE:
-            return 100
-        if voltage <= self.EMPTY_VOLTAGE:
-            return 0
-        percent = ((voltage - self.EMPTY_VOLTAGE) / (self.FULL_VOLTAGE - self.EMPTY_VOLTAGE)) * 100
-        return round(percent)
+    @property
+    def last_update_success(self):
+        """True while at least one shard is up to date."""
+        return any(coordinator.last_update_success for coordinator in self.coordinators.values())
 
-    @property    
-    def native_value(self) -> float:
-        return self._value
+    @property
+    def suppressed_writes(self):
+        return sum(coordinator.suppressed_writes for coordinator in self.coordinators.values())
 
     @property
-    def native_unit_of_measurement(self):
-        return "%"
-    
-class SensorLastActivity(SensorBase):
+    def next_refresh(self):
+        """The earliest refresh any shard has planned (UTC)."""
+        return min(
+            (when for coordinator in self.coordinators.values() if (when := coordinator.next_refresh) is not None),
+            default=None,
+        )
 
-    device_class = SensorDeviceClass.TIMESTAMP
-    _attr_icon = "mdi:calendar-clock"
+    async def async_setup(self):
+        """Restore every shard, then fetch live data for those with no cache."""
+        shards = list(self.coordinators.values())
+        restored = await asyncio.gather(*(coordinator.async_restore() for coordinator in shards))
+
+        pending = []
+        for coordinator, was_restored in zip(shards, restored):
+            if not was_restored:
+                pending.append(coordinator)
+                continue
+            # Entities come up straight away from the cached catalog; login
+            # and the first live fetch happen in the background so a slow
+            # portal doesn't hold up startup.
+            self.entry.async_create_background_task(
+                self.hass, coordinator.async_refresh(), f"{DOMAIN} first refresh {coordinator.name}"
+            )
+
+        if not pending:
+            return
+        if len(shards) == 1:
+            # Nothing cached yet (first setup): we need one live fetch to
+            # know which sensors exist. Login happens as part of the refresh.
+            await pending[0].async_config_entry_first_refresh()
+            return
+
+        # A shard that fails here retries on its own schedule; only an
+        # entry where nothing at all could be fetched is not ready.
+        await asyncio.gather(*(coordinator.async_refresh() for coordinator in pending))
+        if len(pending) == len(shards) and not self.last_update_success:
+            raise ConfigEntryNotReady(
+                f"Error fetching sensor data for all {len(shards)} site(s)"
+            ) from pending[-1].last_exception
 
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator, sid)
+    @callback
+    def async_apply_options(self, entry):
+        """Apply changed options in place; return False if a reload is needed.
 
-        self._attr_unique_id = f"{self._sid}_last_activity"
-        self._attr_name = f"{self._sensor_name} Last Activity"
-        self._value = None
-        self._extract_value()
+        Turning sharding on or off, or changing the sites of a sharded
+        entry, changes the set of coordinators, which only a reload does.
+        """
+        if set(self.coordinators) != set(_shards(entry)):
+            return False
+        for coordinator in self.coordinators.values():
+            coordinator.async_apply_options(entry)
+        return True
+
+    async def async_refresh(self):
+        await asyncio.gather(*(coordinator.async_refresh() for coordinator in self.coordinators.values()))
+
+    async def async_request_refresh(self):
+        await asyncio.gather(
+            *(coordinator.async_request_refresh() for coordinator in self.coordinators.values())
+        )
 
-    def _extract_value(self):
-        # pyomnisense >= 0.3.0 returns last_activity as a tz-aware UTC
-        # datetime (or None when the cell is missing). HA renders it in
-        # the user's local timezone via SensorDeviceClass.TIMESTAMP.
-        self._value = self._get_sensor_data('last_activity', error_value=None)
+    async def async_shutdown(self):
+        await asyncio.gather(*(coordinator.async_shutdown() for coordinator in self.coordinators.values()))
 
-        _LOGGER.debug(f"Updating sensor: {self._attr_name} = last activity at {self._value}")
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._extract_value()
-        self.async_write_ha_state()
+@dataclass(frozen=True, kw_only=True)
+class OmnisenseSensorEntityDescription(SensorEntityDescription):
+    """How one field of a sensor's reading becomes an entity.
 
-    @property    
-    def native_value(self) -> datetime:
-        return self._value
-    
-    
-class SensorRelativeHumidity(SensorBase):
+    ``key`` is the unique_id suffix and ``name`` is appended to the
+    sensor's description. The coordinator only notifies the entity when
+    ``field`` changes for its sensor, and the entity is only created once
+    the sensor's type has reported a value for ``source`` (``field`` if
+    not given), unless ``always_create``. With ``per_sensor`` it takes
+    the sensor itself reporting one.
+    """
 
-    device_class = SensorDeviceClass.HUMIDITY
-    _attr_icon = "mdi:water-percent"
+    field: str
+    source: str | None = None
+    always_create: bool = False
+    per_sensor: bool = False
+    # Applied to the field's value (never to None) before it is shown.
+    value_fn: Callable[[Any], Any] | None = None
+    attributes_fn: Callable[["OmnisenseSensor"], dict | None] | None = None
 
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator, sid)
 
-        self._attr_unique_id = f"{self._sid}_relative_humidity"
-        self._attr_name = f"{self._sensor_name} Relative Humidity"
-        self._value = None
-        self._extract_value()
+@dataclass(frozen=True, slots=True)
+class SensorInfo:
+    """Static metadata of one sensor, shared by all of its entities."""
 
-    def _extract_value(self):
-        self._value = self._get_sensor_data('relative_humidity', error_value=None)           
+    name: str
+    sensor_type: str
+    device_info: DeviceInfo
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._extract_value()
-        self.async_write_ha_state()
 
-    @property    
-    def native_value(self) -> float:
-        return self._value
-    
-    @property
-    def native_unit_of_measurement(self):
-        return "%"   
-    
+def _sensor_info(sid, reading):
+    if reading is None:
+        _LOGGER.warning("No reading for sensor %s yet", sid)
+    elif reading.sensor_id != sid:
+        _LOGGER.warning("Sensor ID mismatch: expected %s, got %s. Using %s instead.", sid, reading.sensor_id, sid)
 
-class SensorAbsoluteHumidity(SensorBase):
+    name = getattr(reading, 'description', None) or 'Unknown'
+    sensor_type = getattr(reading, 'sensor_type', None) or 'Unknown'
+    return SensorInfo(
+        name=name,
+        sensor_type=sensor_type,
+        device_info=DeviceInfo(
+            identifiers={(DOMAIN, sid)},
+            name=name,
+            manufacturer="OmniSense",
+            model=sensor_type,
+            sw_version="N/A",
+        ),
+    )
 
-    device_class = None
-    _attr_icon = "mdi:water-percent"
 
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator, sid)
+class OmnisenseSensor(CoordinatorEntity, SensorEntity):
+    """One field of one Omnisense sensor, as its description says."""
 
-        self._attr_unique_id = f"{self._sid}_absolute_humidity"
-        self._attr_name = f"{self._sensor_name} Absolute Humidity"
-        self._value = None 
-        self._extract_value()
+    should_poll = False
+    entity_description: OmnisenseSensorEntityDescription
 
-    def _extract_value(self):
+    def __init__(self, coordinator, sid, info: SensorInfo, description: OmnisenseSensorEntityDescription):
+        super().__init__(coordinator, context=(sid, description.field))
+        self.entity_description = description
+        self._sid = sid
+        self._attr_unique_id = f"{sid}_{description.key}"
+        self._attr_name = f"{info.name} {description.name}"
+        self._attr_device_info = info.device_info
 
-        self._value = self._get_sensor_data('absolute_humidity')           
-        
+    @property
+    def available(self):
+        # A sensor that dropped off the portal goes unavailable rather than
+        # freezing at its last reading.
+        return super().available and self._sid in self.coordinator.data
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._extract_value()
-        self.async_write_ha_state()
+    @property
+    def native_value(self):
+        reading = self.coordinator.data.get(self._sid)
+        if reading is None:
+            return None
+        value = getattr(reading, self.entity_description.field)
+        value_fn = self.entity_description.value_fn
+        return value if value is None or value_fn is None else value_fn(value)
 
-    @property    
-    def native_value(self) -> float:
-        return self._value
-    
     @property
-    def native_unit_of_measurement(self):
-        return "g/m³"
-    
-class SensorWoodMoisture(SensorBase):
+    def extra_state_attributes(self):
+        attributes_fn = self.entity_description.attributes_fn
+        return None if attributes_fn is None else attributes_fn(self)
 
-    device_class = SensorDeviceClass.MOISTURE
-    _attr_icon = "mdi:water"
 
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator, sid)
+class OmnisenseTrendSensor(OmnisenseSensor):
+    """Rate of change of ``source``, from the coordinator's reading history.
 
-        self._attr_unique_id = f"{self._sid}_wood_moisture"
-        self._attr_name = f"{self._sensor_name} Wood Moistute"
-        self._value = None
-        self._extract_value()
+    Refreshed whenever the sensor reports (last_activity moves), which is
+    exactly when a new point lands in the history.
+    """
 
-    def _extract_value(self):
+    def __init__(self, coordinator, sid, info, description):
+        super().__init__(coordinator, sid, info, description)
+        self._trend = None
+        self._update_trend()
 
-        self._value = self._get_sensor_data('wood_pct', error_value=None)
+    def _update_trend(self):
+        metric = self.entity_description.source
+        self._trend = self.coordinator.history.trend(self._sid, metric, self.coordinator.thresholds.get(metric))
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self._extract_value()
+        self._update_trend()
         self.async_write_ha_state()
 
-    @property    
+    @property
     def native_value(self) -> float:
-        return self._value
-    
+        if self._trend is None or self._trend.rate_per_hour is None:
+            return None
+        return round(self._trend.rate_per_hour, 2)
+
     @property
-    def native_unit_of_measurement(self):
-        return "%"     
-    
+    def extra_state_attributes(self):
+        trend = self._trend
+        if trend is None:
+            return None
+        attributes = {
+            "min_24h": round(trend.minimum, 2),
+            "max_24h": round(trend.maximum, 2),
+            "mean_24h": round(trend.mean, 2),
+            "samples": trend.samples,
+        }
+        if trend.time_above is not None:
+            attributes["threshold"] = self.coordinator.thresholds.get(self.entity_description.source)
+            attributes["hours_above_threshold_24h"] = round(trend.time_above.total_seconds() / 3600, 2)
+        return attributes
+
+
+def _last_activity_attributes(entity):
+    """The learned reporting cadence and the sensor's poll tier.
+
+    Only what changes along with last_activity (or with the options, which
+    rewrite every entity) belongs here: the entity is not written when
+    just the poll schedule or the portal breaker moves. Those are on the
+    entry's refresh latency entities.
+    """
+    scheduler = entity.coordinator.scheduler
+    interval = scheduler.sensor_interval(entity._sid)
+    return {
+        "reporting_interval": round(interval.total_seconds()) if interval else None,
+        "next_expected_report": scheduler.next_report(entity._sid, dt_util.utcnow()),
+        "poll_tier": entity.coordinator.tiers.tier(entity._sid),
+    }
+
+
+SENSOR_DESCRIPTIONS = (
+    OmnisenseSensorEntityDescription(
+        key="temperature",
+        field="temperature",
+        name="Temperature",
+        device_class=SensorDeviceClass.TEMPERATURE,
+        native_unit_of_measurement="°C",
+        icon="mdi:thermometer",
+    ),
+    # Derived by the coordinator from battery_voltage along the configured
+    # discharge curve (see derive.py).
+    OmnisenseSensorEntityDescription(
+        key="battery",
+        field="battery_level",
+        name="Battery Level",
+        device_class=SensorDeviceClass.BATTERY,
+        native_unit_of_measurement="%",
+        icon="mdi:battery",
+    ),
+    # pyomnisense >= 0.3.0 returns last_activity as a tz-aware UTC datetime
+    # (or None when the cell is missing); HA renders it in local time.
+    OmnisenseSensorEntityDescription(
+        key="last_activity",
+        field="last_activity",
+        name="Last Activity",
+        always_create=True,
+        device_class=SensorDeviceClass.TIMESTAMP,
+        icon="mdi:calendar-clock",
+        attributes_fn=_last_activity_attributes,
+    ),
+    OmnisenseSensorEntityDescription(
+        key="relative_humidity",
+        field="relative_humidity",
+        name="Relative Humidity",
+        device_class=SensorDeviceClass.HUMIDITY,
+        native_unit_of_measurement="%",
+        icon="mdi:water-percent",
+    ),
+    OmnisenseSensorEntityDescription(
+        key="absolute_humidity",
+        field="absolute_humidity",
+        name="Absolute Humidity",
+        native_unit_of_measurement="g/m³",
+        icon="mdi:water-percent",
+    ),
+    OmnisenseSensorEntityDescription(
+        key="wood_moisture",
+        field="wood_pct",
+        name="Wood Moisture",
+        device_class=SensorDeviceClass.MOISTURE,
+        native_unit_of_measurement="%",
+        icon="mdi:water",
+    ),
+    OmnisenseSensorEntityDescription(
+        key="dew_point",
+        field="dew_point",
+        name="Dew Point",
+        device_class=SensorDeviceClass.TEMPERATURE,
+        native_unit_of_measurement="°C",
+        icon="mdi:thermometer",
+    ),
+    # Derived by the coordinator from temperature and relative humidity, and
+    # only for sensors that have been warm enough for it to be defined.
+    OmnisenseSensorEntityDescription(
+        key="heat_index",
+        field="heat_index",
+        per_sensor=True,
+        name="Heat Index",
+        device_class=SensorDeviceClass.TEMPERATURE,
+        native_unit_of_measurement="°C",
+        icon="mdi:sun-thermometer",
+    ),
+    OmnisenseSensorEntityDescription(
+        key="battery_voltage",
+        field="battery_voltage",
+        name="Battery Voltage",
+        device_class=SensorDeviceClass.VOLTAGE,
+        native_unit_of_measurement="V",
+        icon="mdi:battery",
+        suggested_display_precision=1,
+        value_fn=lambda volts: round(volts, 1),
+    ),
+)
+
+# Trends follow last_activity, but only exist for sensors reporting their
+# metric.
+TREND_DESCRIPTIONS = tuple(
+    OmnisenseSensorEntityDescription(
+        key=f"{metric}_trend",
+        field="last_activity",
+        source=metric,
+        name=f"{label} Trend",
+        native_unit_of_measurement=f"{unit}/h",
+        state_class=SensorStateClass.MEASUREMENT,
+        icon="mdi:trending-up",
+    )
+    for metric, label, unit in (
+        ("temperature", "Temperature", "°C"),
+        ("relative_humidity", "Relative Humidity", "%"),
+        ("wood_pct", "Wood Moisture", "%"),
+    )
+)
+
+ENTITY_DESCRIPTIONS = (
+    *((OmnisenseSensor, description) for description in SENSOR_DESCRIPTIONS),
+    *((OmnisenseTrendSensor, description) for description in TREND_DESCRIPTIONS),
+)
+
+
+class RefreshLatencySensor(SensorEntity):
+    """Diagnostic: last or 95th percentile refresh latency of an entry."""
+
+    STATISTICS = ("last", "p95")
 
-class SensorDewPoint(SensorBase):
+    should_poll = False
+    device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(self, hub, entry, statistic):
+        self.hub = hub
+        self._statistic = statistic
+        self._attr_unique_id = f"{entry.entry_id}_refresh_latency_{statistic}"
+        label = "Last" if statistic == "last" else "P95"
+        self._attr_name = f"{entry.title} Refresh Latency {label}"
+        self._attr_device_info = _entry_device_info(entry)
+
+    async def async_added_to_hass(self):
+        self.async_on_remove(
+            self.hub.refresh_stats.async_add_listener(self.async_write_ha_state)
+        )
 
-    device_class = SensorDeviceClass.TEMPERATURE
-    _attr_icon = "mdi:thermometer"
+    @property
+    def native_value(self):
+        stats = self.hub.refresh_stats
+        if self._statistic == "last":
+            seconds = stats.last.total if stats.last else None
+        else:
+            seconds = stats.percentile(95)
+        return None if seconds is None else round(seconds * 1000, 1)
 
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator, sid)
+    @property
+    def extra_state_attributes(self):
+        stats = self.hub.refresh_stats
+        if self._statistic != "last" or stats.last is None:
+            return {"refreshes": stats.refreshes, "failures": stats.failures}
+        last = stats.last
+        return {
+            **{f"{phase}_ms": round(seconds * 1000, 1) for phase, seconds in last.phases.items()},
+            "bytes": last.bytes,
+            "sensors_changed": last.changed,
+            "failed_sites": last.failed_sites,
+            "loop_blocked_ms": round(last.loop_blocked * 1000, 1),
+            "loop_max_stall_ms": round(last.loop_max_stall * 1000, 1),
+        }
 
-        self._attr_unique_id = f"{self._sid}_dew_point"
-        self._attr_name = f"{self._sensor_name} Dew Point"
-        self._value = None
-        self._extract_value()
 
-    def _extract_value(self):
-        
-        self._value = self._get_sensor_data('dew_point', error_value=None)           
-        
+class PortalStatusSensor(SensorEntity):
+    """Diagnostic: state of the portal circuit breaker of an entry's account."""
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._extract_value()
-        self.async_write_ha_state()
+    should_poll = False
+    device_class = SensorDeviceClass.ENUM
+    _attr_options = [STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN]
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:lan-connect"
+
+    def __init__(self, hub, entry):
+        self.hub = hub
+        self._attr_unique_id = f"{entry.entry_id}_portal_status"
+        self._attr_name = f"{entry.title} Portal Status"
+        self._attr_device_info = _entry_device_info(entry)
+
+    async def async_added_to_hass(self):
+        # Written after every refresh, failed ones included, so this stays
+        # current without touching the per-sensor entities.
+        self.async_on_remove(
+            self.hub.refresh_stats.async_add_listener(self.async_write_ha_state)
+        )
 
     @property
-    def native_value(self) -> float:
-        return self._value
+    def native_value(self):
+        return self.hub.account.breaker.state
 
     @property
-    def native_unit_of_measurement(self):
-        return "°C"   
-    
-class SensorBatteryVoltage(SensorBase):
-    device_class = SensorDeviceClass.VOLTAGE
-    _attr_icon = "mdi:battery"
-    _attr_suggested_display_precision = 1  # Show 1 decimal place
-
-    def __init__(self, coordinator=None, sid=None):
-        super().__init__(coordinator, sid)
-        self._attr_unique_id = f"{self._sid}_battery_voltage"
-        self._attr_name = f"{self._sensor_name} Battery Voltage"
-        self._value = None
-        self._extract_value()
-
-    def _extract_value(self):
-        # pyomnisense >= 0.3.0 returns battery_voltage as Optional[float].
-        value = self._get_sensor_data('battery_voltage', error_value=None)
-        self._value = round(value, 1) if value is not None else None
-
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        self._extract_value()
-        self.async_write_ha_state()
+    def extra_state_attributes(self):
+        breaker = self.hub.account.breaker
+        return {
+            "next_retry": breaker.retry_at,
+            "next_poll": self.hub.next_refresh,
+            "failures": breaker.failures,
+            "last_error": breaker.last_error,
+        }
 
-    @property
-    def native_value(self) -> float:
-        return self._value
 
-    @property
-    def native_unit_of_measurement(self):
-        return "V"
\ No newline at end of file
+def _entry_device_info(entry):
+    """The service device the entry-level diagnostic entities belong to."""
+    return {
+        "identifiers": {(DOMAIN, entry.entry_id)},
+        "name": entry.title,
+        "manufacturer": "OmniSense",
+        "entry_type": DeviceEntryType.SERVICE,
+    }
@@ -0,0 +1,267 @@
+"""Refresh timing instrumentation for the fetch pipeline."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from operator import attrgetter
+from time import perf_counter
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.util import dt as dt_util
+
+# Refreshes kept in the rolling window the percentiles and histogram are
+# computed over.
+REFRESH_HISTORY = 100
+
+# Upper bucket edges (seconds) of the refresh latency histogram.
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Pipeline phases, in order.
+PHASES = ("login", "fetch", "merge", "diff", "fanout")
+
+# The stall monitor ticks this often while a refresh runs; a tick that
+# fires more than STALL_TOLERANCE late means the loop was blocked.
+STALL_TICK = 0.02
+STALL_TOLERANCE = 0.005
+# A single stall this long during a refresh is worth a warning.
+STALL_WARNING = 0.5
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class FetchMeter:
+    """HTTP time and payload size accumulated by one site fetch."""
+
+    http: float = 0.0
+    bytes: int = 0
+    requests: int = 0
+
+
+# Set by whoever wants a fetch measured; the client adds to it. Each site
+# fetch runs in its own task, so concurrent fetches never share a meter.
+current_meter: ContextVar[FetchMeter | None] = ContextVar("omnisense_fetch_meter", default=None)
+
+
+@dataclass
+class SiteTiming:
+    """Where one site fetch spent its time."""
+
+    http: float
+    parse: float
+    bytes: int
+    changed: bool = True
+    fetched_at: float = field(default_factory=perf_counter)
+
+
+@dataclass
+class RefreshTiming:
+    """Timings and counters for one coordinator refresh."""
+
+    started: float = field(default_factory=perf_counter)
+    at: str = field(default_factory=lambda: dt_util.utcnow().isoformat())
+    phases: dict = field(default_factory=dict)
+    sites: dict = field(default_factory=dict)
+    bytes: int = 0
+    sensors: int = 0
+    changed: int = 0
+    notified: int = 0
+    failed_sites: int = 0
+    unchanged: bool = False
+    success: bool = True
+    total: float = 0.0
+    loop_blocked: float = 0.0
+    loop_max_stall: float = 0.0
+
+    def add(self, phase: str, started: float) -> float:
+        """Add the time since ``started`` to ``phase``; return now."""
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - started
+        return now
+
+    def finish(self):
+        self.total = perf_counter() - self.started
+
+
+class LoopStallMonitor:
+    """Watchdog measuring how late the event loop runs a periodic tick.
+
+    Only ticks between ``start`` and ``stop``, so it costs nothing while
+    no refresh is running.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._handle: asyncio.TimerHandle | None = None
+        self._due = 0.0
+        self.blocked = 0.0
+        self.max_stall = 0.0
+
+    def start(self):
+        self.stop()
+        self.blocked = 0.0
+        self.max_stall = 0.0
+        self._schedule()
+
+    def _schedule(self):
+        self._due = self._loop.time() + STALL_TICK
+        self._handle = self._loop.call_at(self._due, self._tick)
+
+    def _account(self, lag: float):
+        if lag > STALL_TOLERANCE:
+            self.blocked += lag
+            self.max_stall = max(self.max_stall, lag)
+
+    def _tick(self):
+        self._account(self._loop.time() - self._due)
+        self._schedule()
+
+    def stop(self):
+        if self._handle is None:
+            return
+        # A tick overdue right now is a stall that ended in this call.
+        self._account(self._loop.time() - self._due)
+        self._handle.cancel()
+        self._handle = None
+
+
+class RefreshStats:
+    """Rolling window of refresh timings for one coordinator."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, history: int = REFRESH_HISTORY):
+        self._history: deque[RefreshTiming] = deque(maxlen=history)
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._monitor = LoopStallMonitor(loop)
+        self.refreshes = 0
+        self.failures = 0
+
+    @callback
+    def begin(self) -> RefreshTiming:
+        """Start timing a refresh (and watching the loop while it runs)."""
+        self._monitor.start()
+        return RefreshTiming()
+
+    @callback
+    def record(self, timing: RefreshTiming):
+        self._monitor.stop()
+        timing.finish()
+        timing.loop_blocked = self._monitor.blocked
+        timing.loop_max_stall = self._monitor.max_stall
+        if timing.loop_max_stall >= STALL_WARNING:
+            _LOGGER.warning(
+                "Event loop was blocked for up to %.2fs (%.2fs in total) during an Omnisense refresh",
+                timing.loop_max_stall,
+                timing.loop_blocked,
+            )
+        self._history.append(timing)
+        self.refreshes += 1
+        if not timing.success:
+            self.failures += 1
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Call ``update_callback`` after every recorded refresh."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @property
+    def last(self) -> RefreshTiming | None:
+        return self._history[-1] if self._history else None
+
+    def percentile(self, pct: float, phase: str | None = None, attr: str = "total") -> float | None:
+        """Nearest-rank percentile of a timing attribute, or of one phase."""
+        samples = sorted(
+            getattr(timing, attr) if phase is None else timing.phases.get(phase, 0.0)
+            for timing in self._history
+        )
+        if not samples:
+            return None
+        rank = max(0, min(len(samples) - 1, math.ceil(pct / 100 * len(samples)) - 1))
+        return samples[rank]
+
+    def histogram(self) -> dict:
+        """Count of refreshes per latency bucket, keyed by upper edge."""
+        counts = dict.fromkeys([*map(str, HISTOGRAM_BUCKETS), "+Inf"], 0)
+        for timing in self._history:
+            edge = next((edge for edge in HISTOGRAM_BUCKETS if timing.total <= edge), None)
+            counts["+Inf" if edge is None else str(edge)] += 1
+        return counts
+
+    def _last_as_dict(self):
+        if self.last is None:
+            return None
+        last = asdict(self.last)
+        del last["started"]  # perf_counter reference, meaningless outside
+        return last
+
+    def as_dict(self) -> dict:
+        """Summary used by the diagnostics download."""
+        return {
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "window": len(self._history),
+            "total": {
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "max": self.percentile(100),
+            },
+            "phases_p95": {phase: self.percentile(95, phase) for phase in PHASES},
+            "loop_blocked": {
+                "p95": self.percentile(95, attr="loop_blocked"),
+                "max_stall": self.percentile(100, attr="loop_max_stall"),
+            },
+            "histogram": self.histogram(),
+            "last": self._last_as_dict(),
+        }
+
+
+class RefreshStatsGroup(RefreshStats):
+    """Read-only view merging the refresh stats of several coordinators.
+
+    Used for a sharded entry: the window holds the most recent refreshes of
+    all its sites, and listeners hear about every one of them.
+    """
+
+    def __init__(self, members: list[RefreshStats], history: int = REFRESH_HISTORY):
+        # Nothing is timed or recorded here, only read from the members.
+        # pylint: disable=super-init-not-called
+        self.members = members
+        self._window = history
+
+    @property
+    def _history(self) -> list[RefreshTiming]:
+        timings = sorted(
+            (timing for member in self.members for timing in member._history),
+            key=attrgetter("started"),
+        )
+        return timings[-self._window:]
+
+    @property
+    def refreshes(self) -> int:
+        return sum(member.refreshes for member in self.members)
+
+    @property
+    def failures(self) -> int:
+        return sum(member.failures for member in self.members)
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        removers = [member.async_add_listener(update_callback) for member in self.members]
+
+        @callback
+        def remove_listener():
+            for remove in removers:
+                remove()
+
+        return remove_listener
@@ -0,0 +1,131 @@
+"""Persisted sensor catalog, last-known readings and portal sessions."""
+from __future__ import annotations
+
+import hashlib
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .reading import DERIVED_FIELDS, SensorReading
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# Coalesce writes: the cache only has to be roughly current at shutdown,
+# and HA flushes pending delayed saves on stop.
+STORAGE_SAVE_DELAY = 60
+
+# Static per-sensor metadata; everything else in a reading is a measurement.
+# Derived metrics are recomputed on restore rather than stored.
+CATALOG_FIELDS = ("description", "sensor_type", "site_name")
+MEASUREMENT_FIELDS = tuple(
+    field for field in SensorReading.FIELDS
+    if field not in CATALOG_FIELDS and field not in DERIVED_FIELDS and field != "sensor_id"
+)
+
+
+class SensorCache:
+    """Stores the sensor catalog and last snapshot for one config entry.
+
+    A sharded entry keeps one cache per site, next to the entry's own.
+
+    Layout::
+
+        {
+            "catalog": {sid: {"description", "sensor_type", "site_id", "site_name"}},
+            "readings": {sid: {"last_activity", "status", "temperature", ...}},
+            "history": {sid: {"t": [epoch, ...], "temperature": [...], ...}},
+        }
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, site_id: str | None = None):
+        key = f"{DOMAIN}.{entry_id}" if site_id is None else f"{DOMAIN}.{entry_id}.site_{slugify(str(site_id))}"
+        self._store = Store(hass, STORAGE_VERSION, key)
+
+    async def async_load(self):
+        """Return ``(snapshot, site_sensors, history)`` restored from disk.
+
+        ``snapshot`` maps sid to ``SensorReading``, ``site_sensors`` maps
+        site_id to the sids last seen there and ``history`` is the stored
+        form of ``ReadingHistory``. All are empty if nothing was cached yet.
+        """
+        try:
+            stored = await self._store.async_load()
+        except Exception as err:  # corrupt cache must never block setup
+            _LOGGER.warning("Ignoring unreadable Omnisense cache: %s", err)
+            stored = None
+        if not stored:
+            return {}, {}, {}
+
+        snapshot = {}
+        site_sensors = {}
+        readings = stored.get("readings", {})
+        for sid, info in stored.get("catalog", {}).items():
+            reading = dict(readings.get(sid, {}))
+            reading.update({field: info.get(field) for field in CATALOG_FIELDS})
+            reading["sensor_id"] = sid
+            snapshot[sid] = SensorReading.from_dict(reading)
+            if info.get("site_id") is not None:
+                site_sensors.setdefault(info["site_id"], set()).add(sid)
+
+        return snapshot, site_sensors, stored.get("history", {})
+
+    @callback
+    def async_delay_save(self, snapshot, site_sensors, history):
+        """Schedule a write of the given snapshot and reading history."""
+
+        def _data_to_save():
+            site_of = {
+                sid: site_id
+                for site_id, sids in site_sensors.items()
+                for sid in sids
+            }
+            catalog = {}
+            readings = {}
+            for sid, reading in snapshot.items():
+                catalog[sid] = {field: getattr(reading, field) for field in CATALOG_FIELDS}
+                catalog[sid]["site_id"] = site_of.get(sid)
+                readings[sid] = {
+                    field: getattr(reading, field)
+                    for field in MEASUREMENT_FIELDS
+                }
+            return {"catalog": catalog, "readings": readings, "history": history.as_dict()}
+
+        self._store.async_delay_save(_data_to_save, STORAGE_SAVE_DELAY)
+
+    async def async_remove(self):
+        """Delete the cache file."""
+        await self._store.async_remove()
+
+
+class SessionStore:
+    """Stores the portal session cookies for one OmniSense account.
+
+    Keyed by a hash of the username rather than the entry id, so the session
+    established while validating credentials in the config flow is picked up
+    by the entry it creates.
+    """
+
+    def __init__(self, hass: HomeAssistant, username: str):
+        account = hashlib.sha256((username or "").strip().lower().encode()).hexdigest()[:16]
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.session_{account}", private=True)
+
+    async def async_load(self):
+        """Return the saved cookies as ``{name: value}`` (empty if none)."""
+        try:
+            stored = await self._store.async_load()
+        except Exception as err:  # a bad cache only costs us a login
+            _LOGGER.warning("Ignoring unreadable Omnisense session cache: %s", err)
+            return {}
+        return (stored or {}).get("cookies", {})
+
+    async def async_save(self, cookies):
+        """Persist the given cookies."""
+        await self._store.async_save({"cookies": cookies})
+
+    async def async_remove(self):
+        """Forget the saved session."""
+        await self._store.async_remove()